@@ -0,0 +1,303 @@
+'''
+Benchmarks for system2d.iterate / system3d.iterate
+
+Times the integration (steps per second and star-steps per second) and measures
+the peak memory it allocates, for a range of star counts, dimensions, step
+counts, backends and integrators, plus the Sag A* catalog run from the
+notebooks. Results are written to benchmarks/results/<commit>.json so that two
+commits can be compared:
+
+    python benchmarks/benchmark.py                 # full suite
+    python benchmarks/benchmark.py --quick         # smaller cases only
+    python benchmarks/benchmark.py --filter numba  # cases with numba in the name
+    python benchmarks/benchmark.py --compare results/old.json results/new.json
+    python benchmarks/benchmark.py --check         # numba vs numpy agreement only
+
+Before timing anything the numba backend is checked against the numpy one (see
+check_backends()), so a faster backend that gives different orbits is caught
+'''
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WRITEUP = os.path.join(HERE, "..", "Writeup")
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from orbit_core import star_set, system2d, system3d, catalog_stars, profiler, INTEGRATORS
+
+M_SUN = 2e30
+YEAR = 365*24*3600
+
+
+def random_stars(n, dim, M, seed=0):
+    '''
+    n stars on roughly circular orbits between 1 and 5 AU around a mass M
+
+    arguments:
+
+        n : int
+            number of stars
+
+        dim : int
+            number of spatial dimensions (2 or 3)
+
+        M : float
+            central mass (kg)
+
+    returns:
+
+        star_set
+    '''
+    G = 6.67e-11
+    rng = np.random.default_rng(seed)
+
+    dist = rng.uniform(1.5e11, 7.5e11, n)
+    angle = rng.uniform(0, 2*np.pi, n)
+    speed = np.sqrt(G*M/dist)
+
+    r0 = np.zeros((n, dim))
+    v0 = np.zeros((n, dim))
+    r0[:,0], r0[:,1] = dist*np.cos(angle), dist*np.sin(angle)
+    v0[:,0], v0[:,1] = -speed*np.sin(angle), speed*np.cos(angle)
+    if dim == 3:
+        # tilt the orbits a little out of the plane
+        tilt = rng.uniform(-0.2, 0.2, n)
+        v0[:,2] = speed*np.sin(tilt)
+        v0[:,1] *= np.cos(tilt)
+
+    return star_set(r0, v0)
+
+
+def cases(quick=False):
+    '''
+    The benchmark cases as a list of dicts with the name of the case, the
+    function that builds the system, and the arguments for iterate()
+    '''
+    out = []
+
+    def add(name, build, steps, dt, **kwargs):
+        # only keep about 10 stored steps so large runs stay small in memory
+        kwargs.setdefault("every", max(1, steps // 10))
+        out.append({"name": name, "build": build, "tfinal": steps*dt, "dt": dt,
+                    "steps": steps, "kwargs": kwargs})
+
+    # star count and dimension
+    counts = [1, 10, 100, 1000, 10000] if quick else [1, 10, 100, 1000, 10000, 100000]
+    for dim in (2, 3):
+        for n in counts:
+            steps = 1000 if n < 10000 else 100
+            add("stars-%dd-n%d" % (dim, n),
+                lambda n=n, dim=dim: (random_stars(n, dim, M_SUN), M_SUN, dim),
+                steps, YEAR/1000)
+
+    # step count
+    for steps in ([1000, 10000] if quick else [1000, 10000, 100000]):
+        add("steps-2d-n100-s%d" % steps,
+            lambda: (random_stars(100, 2, M_SUN), M_SUN, 2), steps, YEAR/1000)
+
+    # backend and integrator
+    for backend in ("numpy", "numba"):
+        for integrator in ("verlet", "yoshida4", "yoshida6"):
+            for n in (1, 1000):
+                add("method-%s-%s-n%d" % (backend, integrator, n),
+                    lambda n=n: (random_stars(n, 2, M_SUN), M_SUN, 2),
+                    10000 if n == 1 else 1000, YEAR/1000,
+                    backend=backend, integrator=integrator)
+
+    # the Sag A* run from the notebooks, 100 years at 100 steps per year
+    for dim in (2, 3):
+        add("sag-a-%dd" % dim,
+            lambda dim=dim: (catalog_stars(os.path.join(WRITEUP, "SagittariusA_data.xlsx"), dim),
+                             4e6*M_SUN, dim),
+            10000, YEAR/100, every=1)
+
+    return out
+
+
+def run_case(case, repeat=3):
+    '''
+    Runs a single case repeat times and measures it
+
+    returns:
+
+        dict with the best time (seconds), steps per second, star-steps per
+        second and the peak memory allocated during the run (bytes)
+    '''
+    stars, M, dim = case["build"]()
+    cls = system2d if dim == 2 else system3d
+
+    # a profiler without a progress callback keeps iterate() quiet
+    def once():
+        system = cls(stars, M)
+        system.iterate(case["tfinal"], case["dt"], profile=profiler(), **case["kwargs"])
+
+    # a short run first so numba compiling and catalog caching are not timed
+    warm = dict(case["kwargs"], every=1)
+    cls(stars, M).iterate(2*case["dt"], case["dt"], profile=profiler(), **warm)
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        once()
+        times.append(time.perf_counter() - start)
+
+    # tracemalloc slows everything down, so memory is measured on its own run
+    tracemalloc.start()
+    once()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    best = min(times)
+    return {"time": best,
+            "steps_per_sec": case["steps"]/best,
+            "star_steps_per_sec": case["steps"]*len(stars)/best,
+            "peak_memory": peak,
+            "stars": len(stars),
+            "steps": case["steps"]}
+
+
+def check_backends(tol=1e-9):
+    '''
+    Runs the same 2d and 3d runs (100 stars, 20 orbits of the innermost one, 
+    every integrator) with the numpy and numba backends and compares them. The
+    two only differ by rounding, which grows along the orbits, so they are 
+    expected to agree to far better than tol
+
+    returns:
+
+        dict with the largest difference in position (as a fraction of the 
+        distance of the star) of each run, and "ok" if all are below tol. 
+        "ok" is None when numba is not installed
+    '''
+    try:
+        import numba
+    except ImportError:
+        return {"ok": None}
+
+    out = {}
+    for dim in (2, 3):
+        stars = random_stars(100, dim, M_SUN, seed=1)
+        for integrator in INTEGRATORS:
+            r = {}
+            for backend in ("numpy", "numba"):
+                system = (system2d if dim == 2 else system3d)(stars, M_SUN)
+                system.iterate(20*YEAR/8, YEAR/8000, every=100, backend=backend, 
+                               integrator=integrator, profile=profiler())
+                r[backend] = system.r
+            dist = np.sqrt(np.sum(r["numpy"]**2, axis=-1))
+            diff = np.sqrt(np.sum((r["numba"] - r["numpy"])**2, axis=-1))
+            out["%dd-%s" % (dim, integrator)] = float(np.max(diff/dist))
+
+    out["ok"] = max(out.values()) < tol
+    return out
+
+
+def environment():
+    '''
+    Commit, versions and machine the benchmarks were run on
+    '''
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+
+    try:
+        import numba
+        numba_version = numba.__version__
+    except ImportError:
+        numba_version = None
+
+    return {"commit": commit,
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "numba": numba_version,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpus": os.cpu_count()}
+
+
+def compare(old_path, new_path):
+    '''
+    Prints the change in speed and memory of every case found in both result
+    files. Speedups above 1 mean the new results are faster
+    '''
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print("%-34s %12s %12s %9s %9s" % ("case", "old steps/s", "new steps/s",
+                                       "speedup", "memory"))
+    for name, res in new["results"].items():
+        if name not in old["results"]:
+            continue
+        prev = old["results"][name]
+        print("%-34s %12.4g %12.4g %8.2fx %8.2fx" %
+              (name, prev["steps_per_sec"], res["steps_per_sec"],
+               res["steps_per_sec"]/prev["steps_per_sec"],
+               res["peak_memory"]/max(prev["peak_memory"], 1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="skip the largest cases")
+    parser.add_argument("--filter", default="", help="only run cases containing this text")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case")
+    parser.add_argument("--out", help="results file (default results/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two results files instead of running")
+    parser.add_argument("--check", action="store_true",
+                        help="only check that the numba and numpy backends agree")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    check = check_backends()
+    if check["ok"] is None:
+        print("numba is not installed, backend check skipped")
+    else:
+        for name, diff in check.items():
+            if name != "ok":
+                print("numba vs numpy %-14s largest difference %.3g" % (name, diff))
+        if not check["ok"]:
+            sys.exit("the numba backend does not agree with the numpy one")
+    if args.check:
+        return
+
+    env = environment()
+    results = {}
+
+    print("%-34s %10s %12s %14s %10s" % ("case", "time (s)", "steps/s",
+                                          "star-steps/s", "peak MB"))
+    for case in cases(args.quick):
+        if args.filter not in case["name"]:
+            continue
+        res = run_case(case, args.repeat)
+        results[case["name"]] = res
+        print("%-34s %10.4f %12.4g %14.4g %10.2f" %
+              (case["name"], res["time"], res["steps_per_sec"],
+               res["star_steps_per_sec"], res["peak_memory"]/2**20))
+
+    path = args.out or os.path.join(HERE, "results", env["commit"] + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"environment": env, "backend_check": check, "results": results}, f, indent=1)
+    print("results written to", path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+'''
+Work - precision comparison of the integration options of system2d / system3d
+
+Every option (verlet, yoshida4 and yoshida6 at fixed steps, and the adaptive
+step version of each) is run over a range of step sizes on single Kepler
+orbits around Sag A*, with eccentricities like those of the S-stars, and
+compared with the exact solution from kepler_propagate(). For every run the 
+wall clock time is recorded against
+
+    - the largest position error (as a fraction of the semi-major axis)
+    - the largest relative energy error
+    - the turn of the pericentre direction over the run (radians), which is
+      zero for an exact Newtonian orbit
+
+The table is printed, and written with one plot per eccentricity to
+benchmarks/results/work_precision/:
+
+    python benchmarks/work_precision.py
+    python benchmarks/work_precision.py --dim 3 --orbits 5
+    python benchmarks/work_precision.py --quick
+'''
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from orbit_core import star, system2d, system3d, profiler, kepler_propagate, INTEGRATORS
+
+G = 6.67e-11
+M_SAG = 4e6*2e30
+AU = 1.496e11
+
+# S-star like orbits: S2 has e = 0.88 and S14 e = 0.976
+ECCENTRICITIES = [0.2, 0.5, 0.88, 0.976]
+SEMI_MAJOR = 1000*AU
+INCLINATION = 40*np.pi/180
+
+
+def pericentre_state(a, e, M, dim, inc=INCLINATION):
+    '''
+    Position and velocity of a star at the pericentre of an orbit with semi-
+    major axis a and eccentricity e. In 3d the orbit is tilted by inc about the
+    x axis
+    
+    returns:
+    
+        r0, v0 : arrays of shape (dim,)
+    '''
+    q = a*(1 - e)
+    vq = np.sqrt(G*M*(1 + e)/q)
+    if dim == 2:
+        return np.array([q, 0.0]), np.array([0.0, vq])
+    return np.array([q, 0.0, 0.0]), np.array([0.0, vq*np.cos(inc), vq*np.sin(inc)])
+
+
+def pericentre_direction(r, v, M):
+    '''
+    Unit vector towards pericentre (the direction of the Laplace - Runge - Lenz
+    vector), for arrays of positions and velocities of shape (..., 3)
+    '''
+    rn = np.linalg.norm(r, axis=-1, keepdims=True)
+    ecc = (np.sum(v*v, axis=-1, keepdims=True) - G*M/rn)*r - np.sum(r*v, axis=-1, keepdims=True)*v
+    return ecc/np.linalg.norm(ecc, axis=-1, keepdims=True)
+
+
+def errors(t, r, v, a, e, M, dim):
+    '''
+    Position, energy and pericentre errors of a run of one star against the
+    exact orbit
+
+    returns:
+
+        dict with "position" (fraction of a), "energy" (fraction of the exact
+        energy) and "precession" (radians)
+    '''
+    r0, v0 = pericentre_state(a, e, M, dim)
+    r_exact = kepler_propagate(r0[None], v0[None], M, t)[0][:,0]
+
+    energy = 0.5*np.sum(v*v, axis=1) - G*M/np.linalg.norm(r, axis=1)
+    energy0 = -G*M/(2*a)
+
+    if dim == 2:
+        r = np.concatenate([r, np.zeros((len(r), 1))], axis=1)
+        v = np.concatenate([v, np.zeros((len(v), 1))], axis=1)
+    peri = pericentre_direction(r[[0, -1]], v[[0, -1]], M)
+
+    return {"position": np.max(np.linalg.norm(r[:,:dim] - r_exact, axis=1))/a,
+            "energy": np.max(np.abs(energy/energy0 - 1)),
+            "precession": np.arctan2(np.linalg.norm(np.cross(peri[0], peri[1])),
+                                     np.dot(peri[0], peri[1]))}
+
+
+def methods(quick=False):
+    '''
+    The runs to make as (method name, iterate() keyword arguments, list of
+    step settings). Fixed steps are given as steps per orbit, adaptive ones
+    as the tolerance
+    '''
+    per_orbit = [100, 300, 1000, 3000, 10000, 30000]
+    tols = [0.3, 0.1, 0.03, 0.01, 0.003, 0.001]
+    if quick:
+        per_orbit, tols = per_orbit[:4], tols[:4]
+
+    out = []
+    for integrator in INTEGRATORS:
+        out.append((integrator, {"integrator": integrator}, per_orbit))
+        out.append((integrator + "-adaptive", {"integrator": integrator, "adaptive": True}, tols))
+    return out
+
+
+def run(e, name, kwargs, setting, orbits, dim, samples=500):
+    '''
+    Integrates one orbit of eccentricity e with one method and step setting
+
+    returns:
+
+        dict with the settings, the wall clock time and the errors
+    '''
+    a, M = SEMI_MAJOR, M_SAG
+    period = 2*np.pi*np.sqrt(a**3/(G*M))
+    tfinal = orbits*period
+
+    # start at pericentre
+    st = star(*pericentre_state(a, e, M, dim))
+    system = (system2d if dim == 2 else system3d)([st], M)
+
+    if kwargs.get("adaptive"):
+        # dt only sets the output times here, the steps come from tol
+        dt, extra = tfinal/samples, {"tol": setting}
+    else:
+        dt = period/setting
+        extra = {"every": max(1, int(tfinal/dt)//samples)}
+
+    # a profiler without a progress callback keeps iterate() quiet
+    start = time.perf_counter()
+    system.iterate(tfinal, dt, profile=profiler(), **kwargs, **extra)
+    wall = time.perf_counter() - start
+
+    res = {"e": e, "method": name, "setting": setting, "time": wall}
+    res.update(errors(system.t, system.r[:,0], system.v[:,0], a, e, M, dim))
+    return res
+
+
+def plot(rows, path):
+    '''
+    One figure per eccentricity, with the position error, energy error and
+    precession of every method against wall clock time
+    '''
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    for e in sorted(set(row["e"] for row in rows)):
+        fig, axes = plt.subplots(1, 3, figsize=(15, 4.5))
+        for name in dict.fromkeys(row["method"] for row in rows):
+            sel = [row for row in rows if row["e"] == e and row["method"] == name]
+            sel.sort(key=lambda row: row["time"])
+            style = "--" if name.endswith("adaptive") else "-"
+            for ax, key in zip(axes, ("position", "energy", "precession")):
+                ax.loglog([row["time"] for row in sel],
+                          [max(row[key], 1e-17) for row in sel], style, marker="o", label=name)
+
+        for ax, label in zip(axes, ("max position error / a", "max |dE / E|",
+                                    "pericentre turn (rad)")):
+            ax.set_xlabel("wall clock time (s)")
+            ax.set_ylabel(label)
+            ax.grid(True, which="both", alpha=0.3)
+        axes[0].legend()
+        fig.suptitle("Work - precision, e = %g" % e)
+        fig.tight_layout()
+        fig.savefig(os.path.join(path, "work_precision_e%g.png" % e), dpi=100)
+        plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dim", type=int, default=2, choices=(2, 3))
+    parser.add_argument("--orbits", type=float, default=3, help="length of each run in orbits")
+    parser.add_argument("--quick", action="store_true", help="fewer and coarser step sizes")
+    parser.add_argument("--out", default=os.path.join(HERE, "results", "work_precision"),
+                        help="folder for the table and plots")
+    parser.add_argument("--no-plots", action="store_true")
+    args = parser.parse_args()
+
+    rows = []
+    print("%-6s %-18s %9s %10s %11s %11s %11s" % ("e", "method", "setting", "time (s)",
+                                                  "position", "energy", "precession"))
+    for e in ECCENTRICITIES:
+        for name, kwargs, settings in methods(args.quick):
+            for setting in settings:
+                row = run(e, name, kwargs, setting, args.orbits, args.dim)
+                rows.append(row)
+                print("%-6g %-18s %9g %10.4f %11.3e %11.3e %11.3e" %
+                      (e, name, setting, row["time"], row["position"],
+                       row["energy"], row["precession"]))
+
+    os.makedirs(args.out, exist_ok=True)
+    table = os.path.join(args.out, "work_precision_%dd.csv" % args.dim)
+    with open(table, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    print("table written to", table)
+
+    if not args.no_plots:
+        plot(rows, args.out)
+        print("plots written to", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3220 @@
+import numpy as np
+import json
+import os
+import warnings
+import itertools
+import functools
+import hashlib
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+# The plotting (matplotlib, PIL and IPython) lives in orbit_plots.py, which is only
+# imported by the methods that draw something. numba is only imported when the
+# numba backend is used. So running a simulation (e.g. in a sweep worker) starts
+# quickly and does not need any of them installed
+
+
+def __getattr__(name):
+    '''
+    animate_run() and render() used to live in this module, they are loaded from
+    orbit_plots.py the first time they are asked for
+    '''
+    if name in ("animate_run", "render"):
+        import orbit_plots
+        return getattr(orbit_plots, name)
+    raise AttributeError("module " + repr(__name__) + " has no attribute " + repr(name))
+
+
+class star:
+    '''
+    star class
+    
+    attributes:
+        
+        r0: Initial position from central "black hole" in meters
+            Can be stored in both 2 and 3 Dimensions depending on which system
+            class (2d or 3d) will be used
+        
+        v0: Initial velocity in m/s
+            Must have same dimensions in r0
+        
+        r: list of positions stored inside of object
+           values defined in the iterate() method of either system class
+        
+        v: list of velocities stored inside of object
+           values also defined in the iterate() method of either class
+        
+        label: optional name of the star (e.g. "S2"), kept with saved runs
+        
+        m: mass of the star in kg, only used when the stars also pull on each 
+           other (self_gravity in iterate()). Left at 0 the star is a test 
+           particle that only feels the other masses
+    '''
+    
+    def __init__(self, r0, v0, label=None, m=0.0):
+            self.r0 = r0
+        
+            self.v0 = v0
+            
+            self.label = label
+            
+            self.m = m
+        
+            self.r = None
+            
+            self.v = None
+
+
+class star_set:
+    '''
+    Many stars stored together as arrays instead of one star object each, for
+    swarms of test particles. Can be handed to system2d / system3d in place of
+    a list of star objects
+    
+    attributes:
+        
+        r0, v0 : array
+            initial positions (m) and velocities (m/s), shape (stars, dim)
+        
+        m : array
+            masses of the stars (kg), 0 for test particles
+        
+        labels : array
+            names of the stars (None where there is no name)
+        
+        r, v : array
+            positions and velocities, shape (stored steps, stars, dim), defined 
+            in the iterate() method of either system class
+    
+    Indexing with a single number gives back a star object that is a view of 
+    that star, indexing with a slice or a mask gives a smaller star_set
+    '''
+    
+    def __init__(self, r0, v0, m=None, labels=None):
+        self.r0 = np.asarray(r0, dtype=float)
+        self.v0 = np.asarray(v0, dtype=float)
+        
+        n = len(self.r0)
+        self.m = np.zeros(n) if m is None else np.asarray(m, dtype=float)
+        self.labels = np.full(n, None, dtype=object) if labels is None else np.asarray(labels)
+        
+        self.r = None
+        self.v = None
+    
+    def __len__(self):
+        return len(self.r0)
+    
+    def __getitem__(self, k):
+        if isinstance(k, (int, np.integer)):
+            st = star(self.r0[k], self.v0[k], self.labels[k], self.m[k])
+            if self.r is not None:
+                st.r = self.r[:,k]
+                st.v = self.v[:,k]
+            return st
+        
+        sub = star_set(self.r0[k], self.v0[k], self.m[k], self.labels[k])
+        if self.r is not None:
+            sub.r = self.r[:,k]
+            sub.v = self.v[:,k]
+        return sub
+    
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+
+def _labels(star_list):
+    '''
+    Labels of a list of stars or a star_set as a list
+    '''
+    if isinstance(star_list, star_set):
+        return star_list.labels.tolist()
+    return [st.label for st in star_list]
+
+
+def _masses(star_list):
+    '''
+    Masses of a list of stars or a star_set as an array
+    '''
+    if isinstance(star_list, star_set):
+        return star_list.m
+    return np.array([st.m for st in star_list], dtype=float)
+
+
+def _with_state(star_list, r0, v0):
+    '''
+    Copy of star_list (list of stars or star_set) with new initial conditions
+    '''
+    if isinstance(star_list, star_set):
+        return star_set(r0, v0, star_list.m, star_list.labels)
+    return [star(r, v, st.label, st.m) for r, v, st in zip(r0, v0, star_list)]
+
+
+def _star_meta(star_list, dim):
+    '''
+    Initial conditions, labels and masses of the stars in a form that can be 
+    saved to json, see _stars_from_meta()
+    '''
+    r0, v0 = initial_state(star_list, dim)
+    return {"r0": r0.tolist(), "v0": v0.tolist(), "labels": _labels(star_list),
+            "m": _masses(star_list).tolist(), 
+            "star_set": isinstance(star_list, star_set)}
+
+
+def _stars_from_meta(meta):
+    '''
+    Rebuilds the list of stars (or star_set) saved with _star_meta()
+    '''
+    if meta.get("star_set"):
+        return star_set(meta["r0"], meta["v0"], meta["m"], meta["labels"])
+    return [star(r0, v0, label, m) for r0, v0, label, m
+            in zip(meta["r0"], meta["v0"], meta["labels"], meta["m"])]
+
+
+class profiler:
+    '''
+    Instrumentation for iterate(). Pass one in with iterate(..., profile=p) to
+    time the phases of the run, follow its progress and (optionally) measure
+    its peak memory. Nothing is measured when no profiler is given
+    
+    attributes:
+        
+        times : dict
+            seconds spent in each phase of the run: "allocate" (output arrays 
+            and stores), "integrate" (the whole integration), and for the numpy
+            fixed step integrators also "force" (acceleration), "update" 
+            (position and velocity updates), "output" (copying the stored steps
+            out) and "checkpoint"
+        
+        peak_memory : int
+            largest amount of memory (bytes) allocated during the run, None 
+            unless memory=True
+        
+        steps, total : int
+            time steps done so far and in the whole run
+        
+        finished : bool
+            True once the run is over, so the last call to progress can tell 
+            it is the end of the run
+    
+    methods:
+        
+        report : returns the timings as a printable table
+    '''
+    
+    def __init__(self, progress=None, every=1000, memory=False):
+        '''
+        arguments:
+            
+            progress : function
+                called as progress(p) with this profiler every `every` steps and
+                at the end of the run (p.finished), see rate() and eta(). True 
+                prints a line each time (print_progress)
+            
+            every : int
+                number of time steps between calls to progress
+            
+            memory : bool
+                measure the peak memory of the run with tracemalloc (slows 
+                the run down a little)
+        '''
+        self.progress = print_progress if progress is True else progress
+        self.every = int(every)
+        self.memory = memory
+        self.times = {}
+        self.peak_memory = None
+        self.steps = 0
+        self.total = 0
+        self.finished = False
+        self._start = None
+    
+    def add(self, phase, seconds):
+        self.times[phase] = self.times.get(phase, 0.0) + seconds
+    
+    def start(self, total):
+        self.total = int(total)
+        self.steps = 0
+        self.finished = False
+        if self.memory:
+            import tracemalloc
+            tracemalloc.start()
+        self._start = time.perf_counter()
+    
+    def step(self, i):
+        self.steps = i
+        if self.progress is not None and i % self.every == 0:
+            self.progress(self)
+    
+    def stop(self):
+        self.steps = self.total
+        self.finished = True
+        self.add("total", time.perf_counter() - self._start)
+        if self.memory:
+            import tracemalloc
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        if self.progress is not None:
+            self.progress(self)
+    
+    def elapsed(self):
+        return time.perf_counter() - self._start
+    
+    def rate(self):
+        '''
+        time steps per second so far
+        '''
+        elapsed = self.elapsed()
+        return self.steps/elapsed if elapsed > 0 else 0.0
+    
+    def eta(self):
+        '''
+        estimated seconds left in the run
+        '''
+        rate = self.rate()
+        return (self.total - self.steps)/rate if rate > 0 else float("inf")
+    
+    def report(self):
+        total = self.times.get("total", 0.0)
+        lines = ["%-12s %10s %7s" % ("phase", "time (s)", "share")]
+        for phase, seconds in self.times.items():
+            share = 100*seconds/total if total > 0 else 0.0
+            lines.append("%-12s %10.4f %6.1f%%" % (phase, seconds, share))
+        if total > 0:
+            lines.append("%d steps, %.4g steps/s" % (self.total, self.total/total))
+        if self.peak_memory is not None:
+            lines.append("peak memory %.2f MB" % (self.peak_memory/2**20))
+        return "\n".join(lines)
+
+
+def print_progress(p):
+    '''
+    Default progress callback of profiler, prints the step, speed and time left,
+    and the end of run notice of iterate() once the run is over
+    '''
+    if p.finished:
+        print("Data Instantiation Finished, %d steps in %.4g s" % (p.total, p.times["total"]))
+        return
+    print("step %d of %d, %.4g steps/s, %.1f s left" % (p.steps, p.total, p.rate(), p.eta()))
+
+
+def _profiled_step(r, v, a, M, dt, weights, nbody, profile):
+    '''
+    composed_step() with the force and update phases timed into profile
+    '''
+    clock = time.perf_counter
+    force = 0.0
+    update = 0.0
+    for w in weights:
+        h = w*dt
+        t0 = clock()
+        r = r + h*v + h**2/2*a
+        t1 = clock()
+        a_new = acceleration(r, M, nbody)
+        t2 = clock()
+        v = v + h/2*(a_new+a)
+        a = a_new
+        t3 = clock()
+        update += (t1 - t0) + (t3 - t2)
+        force += t2 - t1
+    profile.add("force", force)
+    profile.add("update", update)
+    return r, v, a
+
+
+def orbital_invariants(r, v, M):
+    '''
+    Quantities that stay fixed on an exact orbit around the point mass M: the
+    specific energy, the specific angular momentum and the Laplace - Runge - 
+    Lenz (eccentricity) vector of every star
+    
+    arguments:
+        
+        r, v : array
+            positions and velocities, shape (..., dim)
+        
+        M : float
+            Mass of central black hole for which all other stars orbit around
+    
+    returns:
+        
+        E : array of shape (...), energy per unit mass (J/kg)
+        
+        L : array of shape (...) in 2d or (..., 3) in 3d, angular momentum per
+            unit mass (m^2/s)
+        
+        A : array of shape (..., dim), eccentricity vector (no units, its 
+            length is the eccentricity and it points to pericentre)
+    '''
+    G = 6.67e-11
+    
+    rabs = np.sqrt(np.sum(r*r, axis=-1))
+    v2 = np.sum(v*v, axis=-1)
+    rv = np.sum(r*v, axis=-1)
+    
+    E = v2/2 - G*M/rabs
+    if r.shape[-1] == 2:
+        L = r[...,0]*v[...,1] - r[...,1]*v[...,0]
+    else:
+        L = np.cross(r, v)
+    A = ((v2/(G*M) - 1/rabs)[...,None]*r - (rv/(G*M))[...,None]*v)
+    
+    return E, L, A
+
+
+class diagnostics:
+    '''
+    Conservation checks made while iterate() runs. Every `every` steps the 
+    energy, angular momentum and Laplace - Runge - Lenz vector of each star 
+    (see orbital_invariants()) are compared with their values at the start, 
+    without storing the run. Only a few numbers per star are kept. When a drift
+    goes over its tolerance the run is stopped early, keeping the steps stored
+    up to that point
+    
+    These are the invariants of the central mass alone, so with self_gravity 
+    they measure how much the stars disturb each other as well as the error
+    
+    attributes:
+        
+        energy_drift, angular_momentum_drift, lrl_drift : array
+            drift of every star at the last check: |E/E0 - 1|, |L - L0|/|L0| and 
+            |A - A0| (A has no units)
+        
+        max_energy_drift, max_angular_momentum_drift, max_lrl_drift : array
+            largest drift of every star over the run
+        
+        checks : int
+            number of checks made
+        
+        stopped : int
+            time step the run was stopped at, None if it ran to the end
+    '''
+    
+    def __init__(self, every=100, energy_tol=None, angular_momentum_tol=None, 
+                 lrl_tol=None):
+        '''
+        arguments:
+            
+            every : int
+                number of time steps between checks
+            
+            energy_tol, angular_momentum_tol, lrl_tol : float
+                stop the run once the drift of any star goes over this, None 
+                (default) never stops it
+        '''
+        self.every = int(every)
+        self.energy_tol = energy_tol
+        self.angular_momentum_tol = angular_momentum_tol
+        self.lrl_tol = lrl_tol
+        self.checks = 0
+        self.stopped = None
+    
+    def start(self, r, v, M):
+        self.M = M
+        self._E0, self._L0, self._A0 = orbital_invariants(r, v, M)
+        self._L0abs = np.sqrt(np.sum(np.reshape(self._L0*self._L0, (len(r), -1)), axis=1))
+        
+        zero = np.zeros(len(r))
+        self.energy_drift = zero.copy()
+        self.angular_momentum_drift = zero.copy()
+        self.lrl_drift = zero.copy()
+        self.max_energy_drift = zero.copy()
+        self.max_angular_momentum_drift = zero.copy()
+        self.max_lrl_drift = zero.copy()
+        self.checks = 0
+        self.stopped = None
+    
+    def update(self, i, r, v):
+        '''
+        Checks the state r, v of time step i. Returns False when the run should
+        stop
+        '''
+        E, L, A = orbital_invariants(r, v, self.M)
+        dL = np.reshape(L - self._L0, (len(r), -1))
+        
+        self.energy_drift = np.abs(E/self._E0 - 1)
+        self.angular_momentum_drift = np.sqrt(np.sum(dL*dL, axis=1))/self._L0abs
+        self.lrl_drift = np.sqrt(np.sum((A - self._A0)**2, axis=1))
+        
+        np.maximum(self.max_energy_drift, self.energy_drift, out=self.max_energy_drift)
+        np.maximum(self.max_angular_momentum_drift, self.angular_momentum_drift, 
+                   out=self.max_angular_momentum_drift)
+        np.maximum(self.max_lrl_drift, self.lrl_drift, out=self.max_lrl_drift)
+        self.checks += 1
+        
+        for tol, drift in ((self.energy_tol, self.energy_drift),
+                           (self.angular_momentum_tol, self.angular_momentum_drift),
+                           (self.lrl_tol, self.lrl_drift)):
+            if tol is not None and np.max(drift) > tol:
+                self.stopped = i
+                return False
+        return True
+    
+    def summary(self):
+        '''
+        Largest drift of any star for each invariant
+        '''
+        return {"energy": float(np.max(self.max_energy_drift, initial=0)),
+                "angular_momentum": float(np.max(self.max_angular_momentum_drift, initial=0)),
+                "lrl": float(np.max(self.max_lrl_drift, initial=0))}
+
+
+class orbit_events:
+    '''
+    Pericentre and apocentre passages found while iterate() runs, so they are
+    known without storing the run. An apside is passed when r.v (position dot
+    velocity) of a star changes sign during a step, from - to + at pericentre 
+    and from + to - at apocentre. The time of the passage is refined with a 
+    cubic through r.v and its derivative v^2 + r.a at both ends of the step, 
+    and the position with the Hermite interpolation of r. Stars that start 
+    exactly at an apside (r.v = 0, like the catalog stars) have it recorded 
+    at t = 0. Only the passages are kept
+    
+    methods:
+        
+        table : every passage of every star as arrays
+        
+        orbit : pericentre and apocentre times, periods and precession of one
+            star
+    '''
+    
+    KINDS = np.array(["pericentre", "apocentre"])
+    
+    def __init__(self):
+        self._found = []
+    
+    def start(self, r, v, a, t):
+        self._found = []
+        self._prev = (r, v, a, t)
+        self._s = np.sum(r*v, axis=1)
+        
+        at = np.nonzero(self._s == 0)[0]
+        if len(at):
+            # moving outwards (v^2 + r.a > 0) from a turning point means pericentre
+            kind = (np.sum(v[at]*v[at] + r[at]*a[at], axis=1) < 0).astype(int)
+            self._found.append((at, kind, np.full(len(at), float(t)), r[at].copy()))
+    
+    def update(self, r, v, a, t):
+        '''
+        Looks for apsides between the last state handed over and r, v, a at 
+        time t
+        '''
+        r0, v0, a0, t0 = self._prev
+        s0 = self._s
+        s1 = np.sum(r*v, axis=1)
+        
+        k = np.nonzero(((s0 < 0) & (s1 >= 0)) | ((s0 > 0) & (s1 <= 0)))[0]
+        if len(k):
+            h = t - t0
+            ds0 = np.sum(v0[k]*v0[k] + r0[k]*a0[k], axis=1)
+            ds1 = np.sum(v[k]*v[k] + r[k]*a[k], axis=1)
+            rising = s0[k] < 0
+            
+            # bisection on the cubic, the root is known to be inside the step
+            lo = np.zeros(len(k))
+            hi = np.ones(len(k))
+            for _ in range(40):
+                mid = (lo + hi)/2
+                f = _hermite(mid*h, 0, h, s0[k], ds0, s1[k], ds1)
+                before = (f < 0) == rising
+                lo = np.where(before, mid, lo)
+                hi = np.where(before, hi, mid)
+            theta = (lo + hi)/2
+            
+            pos = _hermite((theta*h)[:,None], 0, h, r0[k], v0[k], r[k], v[k])
+            self._found.append((k, (~rising).astype(int), t0 + theta*h, pos))
+        
+        self._prev = (r, v, a, t)
+        self._s = s1
+    
+    def table(self):
+        '''
+        Every passage found, sorted by star and then time
+        
+        returns:
+            
+            dict of arrays: "star" (index in the star list), "kind" 
+            ("pericentre" or "apocentre"), "t" (seconds), "r" (distance, m) and
+            "position" (m)
+        '''
+        if not self._found:
+            dim = self._prev[0].shape[1]
+            return {"star": np.zeros(0, dtype=int), "kind": self.KINDS[:0], 
+                    "t": np.zeros(0), "r": np.zeros(0), "position": np.zeros((0, dim))}
+        
+        star_k, kind, t, pos = (np.concatenate(x) for x in zip(*self._found))
+        order = np.lexsort((t, star_k))
+        pos = pos[order]
+        return {"star": star_k[order], "kind": self.KINDS[kind[order]], "t": t[order],
+                "r": np.sqrt(np.sum(pos*pos, axis=1)), "position": pos}
+    
+    def orbit(self, k):
+        '''
+        Orbital quantities of star k from its apsides
+        
+        returns:
+            
+            dict of arrays: "pericentre_t", "pericentre_r", "apocentre_t", 
+            "apocentre_r" (passage times and distances), "period" (time between
+            successive pericentres, seconds) and "precession" (turn of the 
+            pericentre direction between successive pericentres, radians. Signed
+            in 2d, positive in the direction of motion, and unsigned in 3d)
+        '''
+        tab = self.table()
+        mine = tab["star"] == k
+        peri = mine & (tab["kind"] == "pericentre")
+        apo = mine & (tab["kind"] == "apocentre")
+        
+        p = tab["position"][peri]
+        p = p/np.sqrt(np.sum(p*p, axis=1))[:,None]
+        dot = np.sum(p[:-1]*p[1:], axis=1)
+        if p.shape[1] == 2:
+            cross = p[:-1,0]*p[1:,1] - p[:-1,1]*p[1:,0]
+            # turning the same way as the orbit counts as positive
+            r0, v0 = self._prev[0][k], self._prev[1][k]
+            cross = cross*np.sign(r0[0]*v0[1] - r0[1]*v0[0])
+        else:
+            cross = np.sqrt(np.sum(np.cross(p[:-1], p[1:])**2, axis=1))
+        
+        return {"pericentre_t": tab["t"][peri], "pericentre_r": tab["r"][peri],
+                "apocentre_t": tab["t"][apo], "apocentre_r": tab["r"][apo],
+                "period": np.diff(tab["t"][peri]), 
+                "precession": np.arctan2(cross, dot)}
+
+
+def output_steps(n, dt, every=1, t_eval=None, final_only=False, tfinal=None):
+    '''
+    Works out which of the n time steps of a run should be kept. The integrator
+    still steps at dt, but only these steps get stored
+    
+    arguments:
+        
+        n : int
+            number of time steps in the run (including the initial conditions)
+        
+        dt : float
+            amount of time between each iteration (seconds)
+        
+        every : int
+            keep every k-th step (1 keeps all of them)
+        
+        t_eval : array
+            times (seconds) to keep instead, each one is rounded to the nearest
+            time step (so it can be up to dt/2 away) and the steps come back in
+            time order, whatever the order of t_eval. Times between the last 
+            step and tfinal give the last step
+        
+        final_only : bool
+            only keep the last step
+        
+        tfinal : float
+            length of the run (seconds), None takes n*dt
+    
+    returns:
+        
+        steps : array of the step indices to store, sorted
+    '''
+    if final_only:
+        return np.array([n-1])
+    
+    if t_eval is not None:
+        if tfinal is None:
+            tfinal = n*dt
+        t_eval = np.asarray(t_eval, dtype=float)
+        # tfinal itself is allowed, the run stops at step n-1 just short of it
+        if np.any(t_eval < 0) or np.any(t_eval > tfinal*(1 + 1e-12)):
+            raise ValueError("t_eval must lie between 0 and tfinal")
+        steps = np.minimum(np.rint(t_eval/dt).astype(int), n-1)
+        return np.sort(steps)
+    
+    return np.arange(0, n, int(every))
+
+
+def initial_state(star_list, dim):
+    '''
+    Stacks the initial positions and velocities of the stars (a list of star 
+    objects or a star_set) into two arrays of shape (number of stars, dim)
+    '''
+    if isinstance(star_list, star_set):
+        return star_list.r0.reshape(-1, dim).copy(), star_list.v0.reshape(-1, dim).copy()
+    
+    r = np.array([star.r0 for star in star_list], dtype=float).reshape(-1, dim)
+    v = np.array([star.v0 for star in star_list], dtype=float).reshape(-1, dim)
+    return r, v
+
+
+def direct_acceleration(r, m, block=1024, eps=0):
+    '''
+    Acceleration of every star due to all of the other stars, found by adding 
+    up every pair (O(N^2)). Exact, so it is used as the reference for 
+    tree_acceleration()
+    
+    arguments:
+        
+        r : array
+            positions of the stars, shape (number of stars, dim)
+        
+        m : array
+            masses of the stars (kg)
+        
+        block : int
+            number of stars handled at once, keeps the pair arrays small
+        
+        eps : float
+            softening length (m), the distance between two stars is taken as 
+            sqrt(d^2 + eps^2) so close pairs do not get huge kicks
+    '''
+    G = 6.67e-11
+    a = np.zeros_like(r)
+    
+    # stars without mass do not pull on anything
+    src = np.flatnonzero(m != 0)
+    
+    for start in range(0, len(r), block):
+        d = r[None,src,:] - r[start:start+block,None,:] # d[i,j] points from star i to star src[j]
+        dist3 = (np.sum(d*d, axis=2) + eps**2)**1.5
+        
+        # a star does not pull on itself, and stars sitting on top of each other
+        # (with no softening) give no direction to pull in
+        dist3[np.arange(start, start+len(d))[:,None] == src[None,:]] = np.inf
+        dist3[dist3 == 0] = np.inf
+        
+        a[start:start+block] = G*np.sum((m[src]/dist3)[:,:,None]*d, axis=1)
+    
+    return a
+
+
+def _build_tree(r, m):
+    '''
+    Builds the quadtree (2d) or octree (3d) used by tree_acceleration(). Every 
+    node covers a contiguous range of the star indices in "order", so a node's
+    stars are order[start[node]:end[node]]
+    
+    returns:
+        
+        dict of node arrays: "size" (width of the cell), "mass", "com" (centre 
+        of mass), "children" (child node indices, -1 where there is none), 
+        "start", "end" and the star order
+    '''
+    n_stars, dim = r.shape
+    n_children = 2**dim
+    
+    lo = r.min(axis=0)
+    width = np.max(r.max(axis=0) - lo)*(1 + 1e-9) + 1e-300
+    
+    order = np.arange(n_stars)
+    size, mass, com, children, start, end = [], [], [], [], [], []
+    
+    # (node index, first star, last star + 1, lower corner, width, depth)
+    stack = [(0, 0, n_stars, lo, width, 0)]
+    size.append(width); mass.append(0.0); com.append(None)
+    children.append([-1]*n_children); start.append(0); end.append(n_stars)
+    
+    while stack:
+        node, i0, i1, corner, w, depth = stack.pop()
+        idx = order[i0:i1]
+        
+        mass[node] = np.sum(m[idx])
+        if mass[node] > 0:
+            com[node] = np.sum(m[idx][:,None]*r[idx], axis=0)/mass[node]
+        else:
+            com[node] = np.mean(r[idx], axis=0)
+        
+        # cells with one star (or stars sitting on top of each other) are leaves
+        if i1 - i0 <= 1 or depth >= 60:
+            continue
+        
+        # which of the 2^dim sub-cells each star falls into
+        upper = (r[idx] >= corner + w/2).astype(int)
+        octant = np.sum(upper*2**np.arange(dim), axis=1)
+        sort = np.argsort(octant, kind="stable")
+        order[i0:i1] = idx[sort]
+        counts = np.bincount(octant, minlength=n_children)
+        
+        first = i0
+        for c in range(n_children):
+            if counts[c] == 0:
+                continue
+            child = len(size)
+            size.append(w/2); mass.append(0.0); com.append(None)
+            children.append([-1]*n_children); start.append(first); end.append(first+counts[c])
+            children[node][c] = child
+            
+            bits = (c >> np.arange(dim)) & 1
+            stack.append((child, first, first+counts[c], corner + bits*w/2, w/2, depth+1))
+            first += counts[c]
+    
+    return {"size": np.array(size), "mass": np.array(mass), "com": np.array(com),
+            "children": np.array(children), "start": np.array(start), 
+            "end": np.array(end), "order": order}
+
+
+def tree_acceleration(r, m, theta=0.5, eps=0):
+    '''
+    Acceleration of every star due to all of the other stars using the Barnes -
+    Hut method (O(N log N)). Stars are sorted into a tree of cells, and a cell
+    that looks small from a star (width/distance < theta) pulls on it as a 
+    single mass at its centre of mass. The tree is walked for all stars at once,
+    one level per pass
+    
+    arguments:
+        
+        r : array
+            positions of the stars, shape (number of stars, dim)
+        
+        m : array
+            masses of the stars (kg)
+        
+        theta : float
+            opening angle, 0 gives the same answer as direct_acceleration() and
+            larger values are faster but less accurate (0.5 is a common choice)
+        
+        eps : float
+            softening length (m), see direct_acceleration()
+    '''
+    G = 6.67e-11
+    n_stars, dim = r.shape
+    tree = _build_tree(r, m)
+    leaf = np.all(tree["children"] < 0, axis=1)
+    
+    def add(i, d, mj):
+        dist3 = (np.sum(d*d, axis=1) + eps**2)**1.5
+        # massless stars and cells pull on nothing, and stars on top of each 
+        # other (with no softening) give no direction to pull in
+        keep = (mj != 0) & (dist3 > 0)
+        i, d, mj, dist3 = i[keep], d[keep], mj[keep], dist3[keep]
+        for k in range(dim):
+            a[:,k] += np.bincount(i, weights=G*mj*d[:,k]/dist3, minlength=n_stars)
+    
+    a = np.zeros_like(r)
+    
+    # every (star, node) pair that still has to be looked at, starting at the root
+    i = np.arange(n_stars)
+    node = np.zeros(n_stars, dtype=int)
+    
+    while len(i) > 0:
+        d = tree["com"][node] - r[i]
+        dist = np.sqrt(np.sum(d*d, axis=1))
+        
+        far = ~leaf[node] & (tree["size"][node] < theta*dist)
+        add(i[far], d[far], tree["mass"][node[far]])
+        
+        # leaves: every star in the cell, apart from the star itself
+        at_leaf = leaf[node]
+        counts = tree["end"][node[at_leaf]] - tree["start"][node[at_leaf]]
+        li = np.repeat(i[at_leaf], counts)
+        offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        lj = tree["order"][np.repeat(tree["start"][node[at_leaf]], counts) + offset]
+        keep = li != lj
+        add(li[keep], r[lj[keep]] - r[li[keep]], m[lj[keep]])
+        
+        # everything else gets opened up into its children
+        opened = ~far & ~at_leaf
+        child = tree["children"][node[opened]]
+        i = np.repeat(i[opened], child.shape[1])[child.ravel() >= 0]
+        node = child.ravel()[child.ravel() >= 0]
+    
+    return a
+
+
+def acceleration(r, M, nbody=None):
+    '''
+    Gravitational acceleration of every star towards the central mass M
+    
+    arguments:
+        
+        r : array
+            positions of the stars, shape (number of stars, dim)
+        
+        M : float
+            Mass of central black hole for which all other stars orbit around
+        
+        nbody : tuple
+            (masses, method, theta, eps) to also include the pull of the stars
+            on each other, method is "direct" (direct_acceleration()) or "tree" 
+            (tree_acceleration()). None leaves it out
+    '''
+    G = 6.67e-11
+    rabs = np.sqrt(np.sum(r*r, axis=1))[:,None]
+    a = -G*M/(rabs**3)*r
+    
+    if nbody is not None:
+        m, method, theta, eps = nbody
+        if method == "direct":
+            a = a + direct_acceleration(r, m, eps=eps)
+        else:
+            a = a + tree_acceleration(r, m, theta, eps)
+    
+    return a
+
+
+def verlet_step(r, v, a, M, dt, nbody=None):
+    '''
+    Moves every star forward by a single Velocity - Verlet step of length dt.
+    a is the acceleration at r, the new acceleration is returned so the next 
+    step does not have to compute it again
+    '''
+    r_new = r + dt*v + dt**2/2*a
+    a_new = acceleration(r_new, M, nbody)
+    v_new = v + dt/2*(a_new+a)
+    return r_new, v_new, a_new
+
+
+# Higher order symplectic schemes built out of Velocity - Verlet steps. A step 
+# of length dt is made of Verlet sub-steps of length w*dt for each weight w. 
+# "yoshida4" is the Forest - Ruth / Yoshida triple jump (4th order), "yoshida6"
+# applies the same triple jump to "yoshida4" (6th order, 9 sub-steps)
+_X4 = 2**(1/3)
+_X6 = 2**(1/5)
+_YOSHIDA4 = [1/(2-_X4), -_X4/(2-_X4), 1/(2-_X4)]
+
+INTEGRATORS = {"verlet": [1.0],
+               "yoshida4": _YOSHIDA4,
+               "yoshida6": [z*w for z in [1/(2-_X6), -_X6/(2-_X6), 1/(2-_X6)] 
+                                for w in _YOSHIDA4]}
+
+
+def integrator_weights(integrator):
+    '''
+    Sub-step weights of one of the schemes in INTEGRATORS
+    '''
+    if integrator not in INTEGRATORS:
+        raise ValueError("integrator must be one of " + ", ".join(INTEGRATORS))
+    return np.array(INTEGRATORS[integrator])
+
+
+def composed_step(r, v, a, M, dt, weights, nbody=None):
+    '''
+    One step of length dt of a composition scheme, i.e. a Velocity - Verlet 
+    step of length w*dt for every weight w (see INTEGRATORS). With weights [1.0]
+    this is exactly verlet_step()
+    '''
+    for w in weights:
+        r, v, a = verlet_step(r, v, a, M, w*dt, nbody)
+    return r, v, a
+
+
+def _verlet_loop(r, v, M, dt, steps, r_out, v_out, weights):
+    '''
+    Same update as composed_step(), written out as plain loops over the stars
+    so that numba can compile it. r and v are the initial 
+    conditions and are updated in place
+    '''
+    G = 6.67e-11
+    n_stars, dim = r.shape
+    
+    # the squared distance is summed as a scalar, slicing r[k] here would 
+    # make a temporary array for every star on every sub-step
+    a = np.zeros((n_stars, dim))
+    for k in range(n_stars):
+        r2 = 0.0
+        for d in range(dim):
+            r2 += r[k,d]*r[k,d]
+        f = -G*M/(r2*np.sqrt(r2))
+        for d in range(dim):
+            a[k,d] = f*r[k,d]
+    
+    j = 0
+    for i in range(steps[-1]+1):
+        if i > 0:
+            for w in weights:
+                h = w*dt
+                for k in range(n_stars):
+                    r2 = 0.0
+                    for d in range(dim):
+                        r[k,d] = r[k,d] + h*v[k,d] + h**2/2*a[k,d]
+                        r2 += r[k,d]*r[k,d]
+                    f = -G*M/(r2*np.sqrt(r2))
+                    for d in range(dim):
+                        a_new = f*r[k,d]
+                        v[k,d] = v[k,d] + h/2*(a_new+a[k,d])
+                        a[k,d] = a_new
+        
+        while j < len(steps) and steps[j] == i:
+            r_out[j] = r
+            v_out[j] = v
+            j += 1
+
+
+_compiled_loop = None
+
+def _jit_verlet_loop():
+    '''
+    Compiles _verlet_loop() with numba the first time it is needed. Returns None
+    when numba is not installed
+    '''
+    global _compiled_loop
+    
+    if _compiled_loop is None:
+        try:
+            import numba
+        except ImportError:
+            return None
+        _compiled_loop = numba.njit(cache=True)(_verlet_loop)
+    return _compiled_loop
+
+
+def velocity_verlet(star_list, M, dt, steps, dim, out=None, backend="numpy",
+                    integrator="verlet", nbody=None, checkpoint=None, 
+                    checkpoint_every=1000, start=None, profile=None, diagnostics=None,
+                    events=None):
+    '''
+    Uses the Velocity - Verlet method to propagate the motion of every star in 
+    star_list at the same time. All of the stars are stored in one array, so each
+    step is a handful of array operations rather than one per star
+    
+    arguments:
+        
+        star_list : star
+            list of star objects that will be orbiting around the central mass
+        
+        M : float
+            Mass of central black hole for which all other stars orbit around
+        
+        dt : float
+            amount of time between each iteration (seconds)
+        
+        steps : array
+            sorted indices of the time steps to store, see output_steps().
+            The run stops at the last one
+        
+        dim : int
+            number of spatial dimensions (2 or 3)
+        
+        out : tuple
+            optional (r, v) arrays of the right shape to write the result into,
+            e.g. the memory mapped files made by create_store()
+        
+        backend : str
+            "numpy" steps all the stars with array operations, "numba" runs the
+            same integration as a compiled loop (falls back to "numpy" with a 
+            warning when numba is not installed)
+        
+        integrator : str
+            which scheme in INTEGRATORS to use for each step, "verlet" (2nd
+            order), "yoshida4" or "yoshida6"
+        
+        nbody : tuple
+            (masses, method, theta, eps) to include the pull of the stars on each
+            other, see acceleration(). Only the numpy backend supports it
+        
+        checkpoint : function
+            called as checkpoint(i, j, r, v, a) every checkpoint_every steps 
+            with the current step, the number of stored steps and the state 
+            (numpy backend only)
+        
+        checkpoint_every : int
+            number of time steps between calls to checkpoint
+        
+        start : tuple
+            (i, j, r, v, a) handed to checkpoint earlier, to carry on a run from
+            there instead of from the initial conditions. The output arrays in
+            out must already hold the first j stored steps
+        
+        profile : profiler
+            optional profiler to time the phases of the run and report progress
+            to (the numba backend only reports the start and the end)
+        
+        diagnostics : diagnostics
+            optional conservation checks (numpy backend only). When they stop
+            the run, only the steps stored so far are returned
+        
+        events : orbit_events
+            optional pericentre / apocentre finder, handed every step (numpy
+            backend only)
+    
+    returns:
+        
+        r, v : arrays of shape (len(steps), number of stars, dim) holding the 
+            position and velocity of every star at the stored time steps
+    '''
+    if profile is not None:
+        tick = time.perf_counter()
+    
+    if out is None:
+        r_out = np.zeros((len(steps), len(star_list), dim))
+        v_out = np.zeros((len(steps), len(star_list), dim))
+    else:
+        r_out, v_out = out
+    
+    if profile is not None:
+        profile.add("allocate", time.perf_counter() - tick)
+    
+    r, v = initial_state(star_list, dim)
+    weights = integrator_weights(integrator)
+    
+    if backend == "numba" and (nbody is not None or checkpoint is not None 
+                               or diagnostics is not None or events is not None):
+        raise ValueError("the numba backend only includes the central mass and "
+                         "does not write checkpoints, diagnostics or events")
+    
+    if backend == "numba":
+        loop = _jit_verlet_loop()
+        if loop is not None:
+            loop(r, v, float(M), float(dt), np.asarray(steps, dtype=np.int64), 
+                 np.asarray(r_out), np.asarray(v_out), weights)
+            return r_out, v_out
+        warnings.warn("numba is not installed, using the numpy backend instead")
+    elif backend != "numpy":
+        raise ValueError("backend must be 'numpy' or 'numba'")
+    
+    # acceleration at the current step, reused as the old acceleration of the next step
+    if start is None:
+        i0, j = 0, 0
+        a = acceleration(r, M, nbody)
+    else:
+        i0, j, r, v, a = start
+    
+    if diagnostics is not None:
+        diagnostics.start(r, v, M)
+    if events is not None:
+        events.start(r, v, a, i0*dt)
+    
+    # without a profiler the loop does exactly what it did before, the checks
+    # below are the only cost
+    for i in range(i0, steps[-1]+1):
+        if i > i0:
+            if profile is None:
+                r, v, a = composed_step(r, v, a, M, dt, weights, nbody)
+            else:
+                r, v, a = _profiled_step(r, v, a, M, dt, weights, nbody, profile)
+                tick = time.perf_counter()
+        
+        # a step can be asked for more than once when t_eval is finer than dt
+        while j < len(steps) and steps[j] == i:
+            r_out[j] = r
+            v_out[j] = v
+            j += 1
+        
+        if profile is not None and i > i0:
+            profile.add("output", time.perf_counter() - tick)
+        
+        if checkpoint is not None and i > i0 and i % checkpoint_every == 0:
+            if profile is not None:
+                tick = time.perf_counter()
+            checkpoint(i, j, r, v, a)
+            if profile is not None:
+                profile.add("checkpoint", time.perf_counter() - tick)
+        
+        if profile is not None and i > i0:
+            profile.step(i)
+        
+        if events is not None and i > i0:
+            events.update(r, v, a, i*dt)
+        
+        if diagnostics is not None and i > i0 and i % diagnostics.every == 0:
+            if not diagnostics.update(i, r, v):
+                warnings.warn("run stopped at step %d of %d, the conserved quantities "
+                              "drifted past their tolerance" % (i, steps[-1]))
+                return r_out[:j], v_out[:j]
+    
+    return r_out, v_out
+
+
+def _hermite(t, t0, h, x0, dx0, x1, dx1):
+    '''
+    Cubic Hermite interpolation of x at times t between (t0, x0, dx0) and 
+    (t0+h, x1, dx1), where dx is the time derivative of x
+    '''
+    s = (t - t0)/h
+    h00 = 2*s**3 - 3*s**2 + 1
+    h10 = s**3 - 2*s**2 + s
+    h01 = -2*s**3 + 3*s**2
+    h11 = s**3 - s**2
+    return h00*x0 + h10*h*dx0 + h01*x1 + h11*h*dx1
+
+
+def _step_size(r, M, tol):
+    '''
+    Step size of each star as a fraction tol of its local dynamical time
+    sqrt(|r|^3/GM), so stars take short steps close to the black hole and long
+    ones far away from it. Returned as a column, shape (number of stars, 1)
+    '''
+    G = 6.67e-11
+    rabs = np.sqrt(np.sum(r*r, axis=1))[:,None]
+    return tol*np.sqrt(rabs**3/(G*M))
+
+
+def adaptive_verlet(star_list, M, t_out, dim, tol, out=None, integrator="verlet"):
+    '''
+    Velocity - Verlet with a separate, changing step size for every star. The 
+    step is taken as the average of the step size at its start and its end 
+    (found from a cheap prediction of where the star ends up), which keeps the 
+    scheme time symmetric so the energy error does not drift over long runs.
+    The result is interpolated back onto the times t_out
+    
+    arguments:
+        
+        star_list : star
+            list of star objects that will be orbiting around the central mass
+        
+        M : float
+            Mass of central black hole for which all other stars orbit around
+        
+        t_out : array
+            sorted times (seconds) to store the positions and velocities at
+        
+        dim : int
+            number of spatial dimensions (2 or 3)
+        
+        tol : float
+            step size as a fraction of the local dynamical time of each star, 
+            smaller values are more accurate
+        
+        out : tuple
+            optional (r, v) arrays to write the result into
+        
+        integrator : str
+            which scheme in INTEGRATORS to use for each step
+    
+    returns:
+        
+        r, v : arrays of shape (len(t_out), number of stars, dim)
+    '''
+    n_stars = len(star_list)
+    n_out = len(t_out)
+    
+    if out is None:
+        r_out = np.zeros((n_out, n_stars, dim))
+        v_out = np.zeros((n_out, n_stars, dim))
+    else:
+        r_out, v_out = out
+    
+    r, v = initial_state(star_list, dim)
+    a = acceleration(r, M)
+    weights = integrator_weights(integrator)
+    
+    t = np.zeros(n_stars)
+    nxt = np.zeros(n_stars, dtype=int) # next output time of each star
+    
+    # outputs at t = 0 (or before) are just the initial conditions
+    while True:
+        due = np.nonzero((nxt < n_out) & (t_out[np.minimum(nxt, n_out-1)] <= t))[0]
+        if len(due) == 0:
+            break
+        r_out[nxt[due], due] = r[due]
+        v_out[nxt[due], due] = v[due]
+        nxt[due] += 1
+    
+    active = np.nonzero(nxt < n_out)[0]
+    while len(active) > 0:
+        ra, va, aa = r[active], v[active], a[active]
+        
+        # time symmetric step: h = (h(start) + h(end))/2, the end point is 
+        # predicted from a Taylor step so it costs no extra force evaluations
+        h0 = _step_size(ra, M, tol)
+        h = h0
+        for _ in range(2):
+            r_pred = ra + h*va + h**2/2*aa
+            h = (h0 + _step_size(r_pred, M, tol))/2
+        
+        r_new, v_new, a_new = composed_step(ra, va, aa, M, h, weights)
+        t_new = t[active] + h[:,0]
+        
+        # fill in every output time this step went past
+        while True:
+            pending = nxt[active] < n_out
+            t_next = t_out[np.minimum(nxt[active], n_out-1)]
+            due = np.nonzero(pending & (t_next <= t_new))[0]
+            if len(due) == 0:
+                break
+            k = active[due]
+            args = (t_next[due][:,None], t[k][:,None], h[due])
+            r_out[nxt[k], k] = _hermite(*args, ra[due], va[due], r_new[due], v_new[due])
+            v_out[nxt[k], k] = _hermite(*args, va[due], aa[due], v_new[due], a_new[due])
+            nxt[k] += 1
+        
+        r[active], v[active], a[active] = r_new, v_new, a_new
+        t[active] = t_new
+        active = active[nxt[active] < n_out]
+    
+    return r_out, v_out
+
+
+def verlet_chunks(star_list, M, dt, n, chunk_steps, dim, every=1, integrator="verlet",
+                  nbody=None, t_eval=None):
+    '''
+    Generator version of velocity_verlet(). Runs the same integration but hands 
+    back the stored steps in blocks of chunk_steps, so only the current block 
+    has to be kept in memory
+    
+    arguments:
+        
+        star_list : star
+            list of star objects that will be orbiting around the central mass
+        
+        M : float
+            Mass of central black hole for which all other stars orbit around
+        
+        dt : float
+            amount of time between each iteration (seconds)
+        
+        n : int
+            number of time steps in the run (including the initial conditions)
+        
+        chunk_steps : int
+            number of stored steps in each block (the last one may be shorter)
+        
+        dim : int
+            number of spatial dimensions (2 or 3)
+        
+        every : int
+            only store every k-th time step
+        
+        integrator : str
+            which scheme in INTEGRATORS to use for each step
+        
+        nbody : tuple
+            (masses, method, theta, eps) to include the pull of the stars on each
+            other, see acceleration()
+        
+        t_eval : array
+            times (seconds) to store instead of every k-th step, see 
+            output_steps()
+    
+    yields:
+        
+        t, r, v : times of the block (seconds) and the positions and velocities
+            of every star, shape (block length, number of stars, dim)
+    '''
+    steps = output_steps(n, dt, every, t_eval)
+    
+    r, v = initial_state(star_list, dim)
+    a = acceleration(r, M, nbody)
+    weights = integrator_weights(integrator)
+    i = 0
+    
+    for start in range(0, len(steps), chunk_steps):
+        block = steps[start:start+chunk_steps]
+        r_out = np.zeros((len(block), len(star_list), dim))
+        v_out = np.zeros((len(block), len(star_list), dim))
+        
+        for j, step in enumerate(block):
+            while i < step:
+                r, v, a = composed_step(r, v, a, M, dt, weights, nbody)
+                i += 1
+            r_out[j] = r
+            v_out[j] = v
+        
+        yield block*dt, r_out, v_out
+
+
+def _stumpff(z):
+    '''
+    Stumpff functions C(z) and S(z) used by the universal variable form of 
+    Kepler's equation (z > 0 ellipse, z < 0 hyperbola). A short series is used
+    close to z = 0 where the closed forms lose precision
+    '''
+    C = np.empty_like(z)
+    S = np.empty_like(z)
+    
+    ell = z > 1e-6
+    hyp = z < -1e-6
+    par = ~(ell | hyp)
+    
+    sz = np.sqrt(z[ell])
+    C[ell] = (1 - np.cos(sz))/z[ell]
+    S[ell] = (sz - np.sin(sz))/sz**3
+    
+    sz = np.sqrt(-z[hyp])
+    C[hyp] = (np.cosh(sz) - 1)/(-z[hyp])
+    S[hyp] = (np.sinh(sz) - sz)/sz**3
+    
+    zp = z[par]
+    C[par] = 1/2 - zp/24 + zp**2/720
+    S[par] = 1/6 - zp/120 + zp**2/5040
+    
+    return C, S
+
+
+def kepler_propagate(r0, v0, M, t, out=None, chunk=4096):
+    '''
+    Exact positions and velocities of stars moving around the point mass M, 
+    found from their initial conditions with the universal variable solution 
+    of the Kepler problem (no time stepping). Kepler's equation is solved for 
+    every (time, star) pair at once with Laguerre - Conway iterations, and 
+    bound orbits are first wrapped into a single period, so any time costs the
+    same to evaluate
+    
+    arguments:
+        
+        r0, v0 : array
+            initial positions and velocities, shape (number of stars, dim)
+        
+        M : float
+            Mass of central black hole for which all other stars orbit around
+        
+        t : array
+            times (seconds, since the initial conditions) to evaluate
+        
+        out : tuple
+            optional (r, v) arrays of shape (len(t), number of stars, dim) to 
+            write the result into
+        
+        chunk : int
+            number of times handled at once, keeps the temporary arrays small
+    
+    returns:
+        
+        r, v : arrays of shape (len(t), number of stars, dim)
+    '''
+    G = 6.67e-11
+    mu = G*M
+    
+    r0 = np.asarray(r0, dtype=float)
+    v0 = np.asarray(v0, dtype=float)
+    t = np.atleast_1d(np.asarray(t, dtype=float))
+    
+    if out is None:
+        r_out = np.zeros((len(t),) + r0.shape)
+        v_out = np.zeros((len(t),) + r0.shape)
+    else:
+        r_out, v_out = out
+    
+    rabs0 = np.sqrt(np.sum(r0*r0, axis=1))
+    sigma0 = np.sum(r0*v0, axis=1)/np.sqrt(mu)
+    alpha = 2/rabs0 - np.sum(v0*v0, axis=1)/mu # 1/a, negative when unbound
+    
+    # bound orbits repeat every period, so only the time since the last full orbit matters
+    bound = alpha > 0
+    period = np.full(len(r0), np.inf)
+    period[bound] = 2*np.pi*np.sqrt(1/alpha[bound]**3/mu)
+    
+    for start in range(0, len(t), chunk):
+        tc = t[start:start+chunk][:,None]*np.ones(len(r0))
+        tc = np.where(bound, np.fmod(tc, period), tc)
+        
+        # starting guesses from Vallado (exact for circular orbits)
+        x = np.sqrt(mu)*tc*np.where(bound, alpha, 1/rabs0)
+        hyp = (alpha < 0) & (tc != 0)
+        if np.any(hyp):
+            ones = np.ones_like(tc)
+            a = (ones/alpha)[hyp]
+            th = tc[hyp]
+            rv0 = (ones*sigma0*np.sqrt(mu))[hyp]
+            rh = (ones*rabs0)[hyp]
+            x[hyp] = np.sign(th)*np.sqrt(-a)*np.log(-2*mu*th/a/(
+                rv0 + np.sign(th)*np.sqrt(-mu*a)*(1 - rh/a)))
+        
+        n = 5
+        for _ in range(50):
+            z = alpha*x**2
+            C, S = _stumpff(z)
+            f = (sigma0*x**2*C + (1 - alpha*rabs0)*x**3*S + rabs0*x 
+                 - np.sqrt(mu)*tc)
+            df = sigma0*x*(1 - z*S) + (1 - alpha*rabs0)*x**2*C + rabs0
+            d2f = sigma0*(1 - z*C) + (1 - alpha*rabs0)*x*(1 - z*S)
+            
+            root = np.sqrt(np.abs((n-1)**2*df**2 - n*(n-1)*f*d2f))
+            dx = n*f/(df + np.sign(df)*root)
+            x = x - dx
+            
+            if np.all(np.abs(dx) <= 1e-13*np.maximum(np.abs(x), 1)):
+                break
+        
+        z = alpha*x**2
+        C, S = _stumpff(z)
+        
+        # Lagrange coefficients
+        f = 1 - x**2/rabs0*C
+        g = tc - x**3/np.sqrt(mu)*S
+        r = f[:,:,None]*r0 + g[:,:,None]*v0
+        
+        rabs = np.sqrt(np.sum(r*r, axis=2))
+        fdot = np.sqrt(mu)/(rabs*rabs0)*(alpha*x**3*S - x)
+        gdot = 1 - x**2/rabs*C
+        
+        r_out[start:start+chunk] = r
+        v_out[start:start+chunk] = fdot[:,:,None]*r0 + gdot[:,:,None]*v0
+    
+    return r_out, v_out
+
+
+def dense_output(t, r, v, times, M, nbody=None, derivative=0):
+    '''
+    Positions (or velocities) of every star at any times inside of a stored 
+    run, by cubic Hermite interpolation between the stored steps on either side
+    of each time. Positions use the stored velocities as their slope, 
+    velocities use the acceleration at the stored positions, so both are 4th
+    order accurate in the spacing of the stored steps. Works on memory mapped
+    runs too, only the stored steps that are needed are read
+    
+    arguments:
+        
+        t : array
+            times of the stored steps (seconds), in time order. Repeated times
+            (the same step stored twice) are fine
+        
+        r, v : array
+            stored positions and velocities, shape (len(t), number of stars, dim)
+        
+        times : array
+            times (seconds) to evaluate, between t[0] and t[-1], in any order
+        
+        M : float
+            Mass of central black hole for which all other stars orbit around
+        
+        nbody : tuple
+            (masses, method, theta, eps) if the run included self gravity, see 
+            acceleration(). Only used for velocities
+        
+        derivative : int
+            0 for positions, 1 for velocities
+    
+    returns:
+        
+        array of shape (len(times), number of stars, dim)
+    '''
+    t = np.asarray(t, dtype=float)
+    times = np.asarray(times, dtype=float)
+    
+    if np.any(np.diff(t) < 0):
+        raise ValueError("the stored steps must be in time order to interpolate")
+    # stored steps that start an interval of non zero length
+    starts = np.flatnonzero(np.diff(t) > 0)
+    if len(starts) == 0:
+        raise ValueError("the run needs at least two stored steps to interpolate")
+    if np.any(times < t[0]) or np.any(times > t[-1]):
+        raise ValueError("times must lie between the first and last stored step")
+    
+    # stored step at the start of the interval each time falls in
+    i = starts[np.clip(np.searchsorted(t[starts], times, side="right") - 1, 0, len(starts)-1)]
+    t0 = t[i][:,None,None]
+    h = (t[i+1] - t[i])[:,None,None]
+    
+    if derivative == 0:
+        return _hermite(times[:,None,None], t0, h, r[i], v[i], r[i+1], v[i+1])
+    
+    # acceleration of every stored step that is needed, each worked out once
+    need, where = np.unique(np.concatenate([i, i+1]), return_inverse=True)
+    a = np.array([acceleration(np.asarray(r[k]), M, nbody) for k in need])
+    a0, a1 = a[where[:len(i)]], a[where[len(i):]]
+    return _hermite(times[:,None,None], t0, h, v[i], a0, v[i+1], a1)
+
+
+def create_store(path, star_list, M, dt, tfinal, t, dim, settings=None):
+    '''
+    Sets up a folder holding a run on disk. Positions and velocities go into
+    memory mapped .npy files (r.npy, v.npy), the stored times into t.npy and 
+    everything needed to describe the run into meta.json
+    
+    arguments:
+        
+        path : str
+            folder to write the run into (created if it does not exist)
+        
+        star_list : star
+            list of star objects in the run
+        
+        M : float
+            Mass of central black hole for which all other stars orbit around
+        
+        dt, tfinal : float
+            time step and length of the run (seconds)
+        
+        t : array
+            times of the stored steps (seconds)
+        
+        dim : int
+            number of spatial dimensions (2 or 3)
+        
+        settings : dict
+            options of iterate() that extend() needs to carry on the run
+    
+    returns:
+        
+        r, v : writable memory maps of shape (len(t), number of stars, dim)
+    '''
+    os.makedirs(path, exist_ok=True)
+    
+    meta = {"M": M,
+            "dt": dt,
+            "tfinal": tfinal,
+            "dim": dim,
+            "stored": len(t),
+            "stopped": None,
+            "settings": settings}
+    meta.update(_star_meta(star_list, dim))
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=1)
+    
+    np.save(os.path.join(path, "t.npy"), t)
+    
+    shape = (len(t), len(star_list), dim)
+    r = np.lib.format.open_memmap(os.path.join(path, "r.npy"), mode="w+", shape=shape)
+    v = np.lib.format.open_memmap(os.path.join(path, "v.npy"), mode="w+", shape=shape)
+    return r, v
+
+
+def _cut_store(path, t, stopped):
+    '''
+    Marks a store whose run was stopped early (see diagnostics): t.npy is cut 
+    down to the steps that were stored and meta.json records how many there 
+    are and the step the run stopped at. r.npy and v.npy keep their length, 
+    load_store() only reads the first meta["stored"] steps of them
+    '''
+    np.save(os.path.join(path, "t.npy"), t)
+    
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    meta["stored"] = len(t)
+    meta["stopped"] = stopped
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=1)
+
+
+def load_store(path):
+    '''
+    Opens a run written with iterate(..., store=path) without loading it. The 
+    system and star objects come back as they were after iterate(), but their
+    r and v are read only memory maps, so only the parts that are used get read
+    from disk. A run that the diagnostics stopped early only holds the steps
+    stored before the stop (meta["stopped"] is the step it stopped at). 
+    extend() carries the run on in memory with the settings it was run with
+    
+    arguments:
+        
+        path : str
+            folder the run was written into
+    
+    returns:
+        
+        system2d or system3d object (depending on the dimension of the run)
+    '''
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    
+    star_list = _stars_from_meta(meta)
+    
+    if meta["dim"] == 2:
+        system = system2d(star_list, meta["M"])
+    else:
+        system = system3d(star_list, meta["M"])
+    
+    t = np.load(os.path.join(path, "t.npy"))
+    r = np.load(os.path.join(path, "r.npy"), mmap_mode="r")
+    v = np.load(os.path.join(path, "v.npy"), mmap_mode="r")
+    n = meta.get("stored", len(t))
+    _store(system, t[:n], r[:n], v[:n])
+    system._settings = meta.get("settings")
+    
+    return system
+
+
+def _nbody(star_list, self_gravity, theta, eps=0):
+    '''
+    Settings passed on to acceleration() for the self_gravity option of iterate()
+    '''
+    if self_gravity is None:
+        return None
+    if self_gravity not in ("direct", "tree"):
+        raise ValueError("self_gravity must be None, 'direct' or 'tree'")
+    
+    return (_masses(star_list), self_gravity, theta, eps)
+
+
+def _checkpoint_saver(path, meta, steps, out):
+    '''
+    Makes the function velocity_verlet() calls to write a checkpoint. The 
+    stored steps are already on disk in memory maps (see _checkpoint_outputs())
+    and only get flushed, so the checkpoint itself only holds the current 
+    state. The file is written next to path first and then moved over it, so a
+    run that dies while saving still leaves the previous checkpoint behind
+    '''
+    r_out, v_out = out
+    
+    def save(i, j, r, v, a):
+        arrays = {"meta": json.dumps(meta), "steps": steps, "i": i, "j": j, 
+                  "r": r, "v": v, "a": a}
+        r_out.flush()
+        v_out.flush()
+        
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(path + ".tmp", path)
+    
+    return save
+
+
+def _checkpoint_outputs(path, store, shape=None):
+    '''
+    Memory mapped r and v outputs of a checkpointed run. A run with a store 
+    uses the store, otherwise they are kept next to the checkpoint as 
+    path + ".r.npy" and path + ".v.npy". With a shape they are made, without
+    one the existing files are opened to carry on writing
+    '''
+    if store is not None:
+        names = [os.path.join(store, "r.npy"), os.path.join(store, "v.npy")]
+    else:
+        names = [path + ".r.npy", path + ".v.npy"]
+    if shape is None:
+        return tuple(np.load(name, mmap_mode="r+") for name in names)
+    return tuple(np.lib.format.open_memmap(name, mode="w+", shape=shape) for name in names)
+
+
+def resume(path):
+    '''
+    Carries on a run started with iterate(..., checkpoint=path) from its last
+    checkpoint, and keeps writing checkpoints as it goes. The result is the same
+    (to the last bit) as if the run had never stopped
+    
+    arguments:
+        
+        path : str
+            checkpoint file written by iterate()
+    
+    returns:
+        
+        system2d or system3d object holding the finished run, like after 
+        iterate()
+    '''
+    data = np.load(path)
+    meta = json.loads(str(data["meta"]))
+    steps = data["steps"]
+    i, j = int(data["i"]), int(data["j"])
+    dim = meta["dim"]
+    
+    star_list = _stars_from_meta(meta)
+    
+    if dim == 2:
+        system = system2d(star_list, meta["M"])
+    else:
+        system = system3d(star_list, meta["M"])
+    
+    out = _checkpoint_outputs(path, meta["store"])
+    
+    start = (i, j, data["r"], data["v"], data["a"])
+    nbody = _nbody(star_list, meta["self_gravity"], meta["theta"], meta.get("eps", 0))
+    
+    r, v = velocity_verlet(star_list, meta["M"], meta["dt"], steps, dim, out, "numpy",
+                           meta["integrator"], nbody, 
+                           _checkpoint_saver(path, meta, steps, out), 
+                           meta["checkpoint_every"], start)
+    
+    r.flush()
+    v.flush()
+    if meta["store"] is None:
+        # the run was asked for in memory, the files only backed the checkpoints
+        r, v = np.array(r), np.array(v)
+    _store(system, steps*meta["dt"], r, v)
+    system._settings = meta.get("settings")
+    
+    return system
+
+
+def _run(system, tfinal, dt, dim, every, t_eval, final_only, store, backend,
+         adaptive, tol, integrator, self_gravity=None, theta=0.5, checkpoint=None,
+         checkpoint_every=1000, profile=None, diagnostics=None, events=None, eps=0):
+    '''
+    Shared body of system2d.iterate() and system3d.iterate()
+    '''
+    nbody = _nbody(system.star_list, self_gravity, theta, eps)
+    if (nbody is not None or checkpoint is not None) and (adaptive or integrator == "kepler"):
+        raise ValueError("self_gravity and checkpoint need a fixed dt and a time "
+                         "stepping integrator")
+    if (diagnostics is not None or events is not None) and (adaptive or integrator == "kepler"):
+        raise ValueError("diagnostics and events need a fixed dt and a time stepping "
+                         "integrator")
+    if adaptive and backend == "numba":
+        raise ValueError("the adaptive mode only runs on the numpy backend")
+    
+    n = int(tfinal/dt)
+    steps = output_steps(n, dt, every, t_eval, final_only, tfinal)
+    
+    # kept with the run (and in its store and checkpoint) so that extend() can
+    # carry it on
+    settings = {"dt": dt, "every": every if t_eval is None and not final_only else 1,
+                "backend": backend, "adaptive": adaptive, "tol": tol, 
+                "integrator": integrator, "self_gravity": self_gravity, 
+                "theta": theta, "eps": eps}
+    
+    if profile is True:
+        profile = profiler()
+    if profile is not None:
+        system.profile = profile
+        profile.start(steps[-1])
+        tick = time.perf_counter()
+    
+    out = None
+    if store is not None:
+        out = create_store(store, system.star_list, system.M, dt, tfinal, steps*dt, dim,
+                           settings)
+    
+    save = None
+    if checkpoint is not None:
+        # the stored steps go straight to disk, so checkpoints never rewrite them
+        if out is None:
+            out = _checkpoint_outputs(checkpoint, None, 
+                                      (len(steps), len(system.star_list), dim))
+        
+        meta = {"M": system.M, "dt": dt, "tfinal": tfinal, "dim": dim,
+                "integrator": integrator, "self_gravity": self_gravity, 
+                "theta": theta, "eps": eps, "store": store, 
+                "checkpoint_every": checkpoint_every,
+                "settings": settings}
+        meta.update(_star_meta(system.star_list, dim))
+        save = _checkpoint_saver(checkpoint, meta, steps, out)
+    
+    if profile is not None:
+        profile.add("allocate", time.perf_counter() - tick)
+        tick = time.perf_counter()
+    
+    if diagnostics is not None:
+        system.diagnostics = diagnostics
+    if events is True:
+        events = orbit_events()
+    if events is not None:
+        system.events = events
+    
+    # every star is advanced at once, the star objects only hold views
+    r, v = _integrate(system.star_list, system.M, dt, steps, dim, out, backend, 
+                      adaptive, tol, integrator, nbody, save, checkpoint_every, 
+                      profile, diagnostics, events)
+    
+    # the diagnostics can stop the run before the last stored step
+    steps = steps[:len(r)]
+    
+    if profile is not None:
+        profile.add("integrate", time.perf_counter() - tick)
+    
+    if store is not None:
+        r.flush()
+        v.flush()
+        if diagnostics is not None and diagnostics.stopped is not None:
+            _cut_store(store, steps*dt, diagnostics.stopped)
+    elif checkpoint is not None:
+        # the run was asked for in memory, the files only back the checkpoints
+        r, v = np.array(r), np.array(v)
+    _store(system, steps*dt, r, v)
+    
+    if profile is not None:
+        profile.stop()
+    
+    system._settings = settings
+
+
+def _integrate(star_list, M, dt, steps, dim, out, backend, adaptive, tol, integrator,
+               nbody, save=None, checkpoint_every=1000, profile=None, diagnostics=None,
+               events=None):
+    '''
+    Hands the run to the right integrator for the options of iterate()
+    '''
+    if integrator == "kepler":
+        r0, v0 = initial_state(star_list, dim)
+        return kepler_propagate(r0, v0, M, steps*dt, out)
+    elif adaptive:
+        return adaptive_verlet(star_list, M, steps*dt, dim, tol, out, integrator)
+    else:
+        return velocity_verlet(star_list, M, dt, steps, dim, out, backend,
+                               integrator, nbody, save, checkpoint_every, 
+                               profile=profile, diagnostics=diagnostics, events=events)
+
+
+def _extend(system, extra_time, dim, every=None):
+    '''
+    Shared body of system2d.extend() and system3d.extend()
+    '''
+    settings = getattr(system, "_settings", None)
+    if settings is None:
+        raise ValueError("extend() carries on a run, call iterate() first")
+    
+    dt = settings["dt"]
+    every = int(every or settings["every"])
+    
+    # the run has to end on a stored step, so it can be carried on again later
+    n = int(extra_time/dt)//every*every
+    if n == 0:
+        return
+    steps = np.arange(0, n+1, every)
+    
+    # the last stored state becomes the initial conditions of the new part
+    start = _with_state(system.star_list, system.r[-1], system.v[-1])
+    nbody = _nbody(start, settings["self_gravity"], settings["theta"], 
+                   settings.get("eps", 0))
+    
+    r, v = _integrate(start, system.M, dt, steps, dim, None, settings["backend"], 
+                      settings["adaptive"], settings["tol"], settings["integrator"], 
+                      nbody)
+    
+    # grow the storage by doubling, so extending many times stays cheap
+    n_old = len(system.t)
+    n_new = n_old + len(steps) - 1
+    t_buf, r_buf, v_buf = getattr(system, "_buffers", None) or (None, None, None)
+    
+    if r_buf is None or len(r_buf) < n_new:
+        size = max(n_new, 2*n_old)
+        t_buf = np.zeros(size)
+        r_buf = np.zeros((size,) + system.r.shape[1:])
+        v_buf = np.zeros((size,) + system.v.shape[1:])
+        t_buf[:n_old] = system.t
+        r_buf[:n_old] = system.r
+        v_buf[:n_old] = system.v
+    
+    t_buf[n_old:n_new] = system.t[-1] + steps[1:]*dt
+    r_buf[n_old:n_new] = r[1:]
+    v_buf[n_old:n_new] = v[1:]
+    
+    _store(system, t_buf[:n_new], r_buf[:n_new], v_buf[:n_new])
+    system._settings = dict(settings, every=every)
+    system._buffers = (t_buf, r_buf, v_buf)
+
+
+class sweep_result:
+    '''
+    Result of sweep(), one labelled block of final states (or states at t_eval)
+    for every combination of the swept parameters
+    
+    attributes:
+        
+        r, v : array
+            positions and velocities, shape (masses, star sets, dts, tfinals, 
+            stored times, stars, dim). The stored times are in the order of
+            t_eval. Star sets with fewer stars than the largest one, and tasks
+            that failed, are filled with NaN
+        
+        coords : dict
+            values along each axis of r and v: "M", "star_set" (index into the 
+            star sets), "dt", "tfinal" and "t" (the requested times in 
+            seconds, None when only the final state of each run was kept). 
+            "t_step" holds the times that were actually stored, each t rounded
+            to its run's time step, shape (dts, tfinals, stored times)
+        
+        labels : list
+            star labels of each star set
+        
+        errors : dict
+            error message of every task that failed, keyed by its index into r
+    '''
+    
+    def __init__(self, r, v, coords, labels, errors):
+        self.r = r
+        self.v = v
+        self.coords = coords
+        self.labels = labels
+        self.errors = errors
+
+
+def _sweep_task(task):
+    '''
+    Runs a single point of a sweep inside a worker process. Errors are caught 
+    and handed back, so one bad point does not stop the rest of the sweep
+    '''
+    index, M, r0, v0, dt, tfinal, dim, t_eval, integrator, backend = task
+    
+    try:
+        stars = star_set(r0, v0)
+        system = system2d(stars, M) if dim == 2 else system3d(stars, M)
+        _run(system, tfinal, dt, dim, 1, t_eval, t_eval is None, None, backend,
+             False, 1e-2, integrator)
+        return index, system.r, system.v, None
+    except Exception as e:
+        return index, None, None, repr(e)
+
+
+def _sweep_chunk(tasks):
+    '''
+    Runs the chunksize tasks handed to a worker at once
+    '''
+    return [_sweep_task(task) for task in tasks]
+
+
+def _sweep_pool(tasks, workers, chunksize):
+    '''
+    Runs the tasks of a sweep over a pool of worker processes and yields their
+    results as they finish. A worker that dies (out of memory, segfault) takes
+    the whole pool down with it, so the tasks lost that way are run again one 
+    per pool, and only the one that kills its worker fails
+    '''
+    lost = []
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {pool.submit(_sweep_chunk, tasks[k:k+chunksize]): tasks[k:k+chunksize]
+                   for k in range(0, len(tasks), chunksize)}
+        for future in as_completed(futures):
+            try:
+                yield from future.result()
+            except BrokenProcessPool:
+                lost.extend(futures[future])
+            except Exception as e:
+                for task in futures[future]:
+                    yield task[0], None, None, repr(e)
+    
+    for task in lost:
+        with ProcessPoolExecutor(1) as pool:
+            try:
+                yield pool.submit(_sweep_task, task).result()
+            except Exception as e:
+                yield task[0], None, None, repr(e)
+
+
+def sweep(masses, star_sets, dts, tfinals, dim, t_eval=None, workers=None, 
+          chunksize=1, integrator="verlet", backend="numpy", progress=True):
+    '''
+    Runs every combination of central mass, star set, dt and tfinal, spread 
+    over a pool of worker processes, and gathers the results into a single
+    labelled array (see sweep_result)
+    
+    arguments:
+        
+        masses : list
+            central masses to try (kg)
+        
+        star_sets : list
+            lists of star objects, e.g. built from SagittariusA_data.xlsx with 
+            different initial conditions
+        
+        dts, tfinals : list
+            time steps and run lengths to try (seconds)
+        
+        dim : int
+            number of spatial dimensions (2 or 3)
+        
+        t_eval : array
+            times (seconds) to store for every run, between 0 and the shortest 
+            tfinal (which gives the last step of the run), rounded to the time
+            step of each run (see sweep_result). Only the final state is stored
+            when left as None
+        
+        workers : int
+            number of worker processes (None uses every CPU, 1 runs the sweep 
+            here without a pool)
+        
+        chunksize : int
+            number of runs handed to a worker at a time, larger values cut down 
+            on overhead when the runs are short
+        
+        integrator, backend : str
+            passed on to iterate()
+        
+        progress : bool
+            print a line as each run finishes (in the order they finish)
+    
+    returns:
+        
+        sweep_result object
+    '''
+    sets = [initial_state(star_list, dim) for star_list in star_sets]
+    labels = [_labels(star_list) for star_list in star_sets]
+    
+    shape = (len(masses), len(star_sets), len(dts), len(tfinals))
+    tasks = [(index, masses[index[0]], sets[index[1]][0], sets[index[1]][1], 
+              dts[index[2]], tfinals[index[3]], dim, t_eval, integrator, backend)
+             for index in itertools.product(*[range(n) for n in shape])]
+    
+    n_out = 1 if t_eval is None else len(t_eval)
+    n_stars = max(len(star_list) for star_list in star_sets)
+    r = np.full(shape + (n_out, n_stars, dim), np.nan)
+    v = np.full(shape + (n_out, n_stars, dim), np.nan)
+    errors = {}
+    
+    # the runs store their steps in time order, put them back in t_eval's order
+    order = np.arange(n_out) if t_eval is None else np.argsort(t_eval, kind="stable")
+    
+    if workers == 1:
+        results = map(_sweep_task, tasks)
+    else:
+        results = _sweep_pool(tasks, workers, chunksize)
+    
+    for done, (index, r_task, v_task, error) in enumerate(results, 1):
+        if error is None:
+            r[index][order, :r_task.shape[1]] = r_task
+            v[index][order, :v_task.shape[1]] = v_task
+        else:
+            errors[index] = error
+        
+        if progress:
+            print("run", done, "of", len(tasks), "finished",
+                  "" if error is None else "(failed: " + error + ")")
+    
+    coords = {"M": np.asarray(masses), "star_set": np.arange(len(star_sets)),
+              "dt": np.asarray(dts), "tfinal": np.asarray(tfinals), 
+              "t": None if t_eval is None else np.asarray(t_eval), "t_step": None}
+    if t_eval is not None:
+        coords["t_step"] = np.zeros((len(dts), len(tfinals), n_out))
+        for a, dt in enumerate(dts):
+            for b, tfinal in enumerate(tfinals):
+                steps = output_steps(int(tfinal/dt), dt, t_eval=t_eval, tfinal=tfinal)
+                coords["t_step"][a, b, order] = steps*dt
+    
+    return sweep_result(r, v, coords, labels, errors)
+
+
+def _store(system, t, r, v):
+    '''
+    Keeps the result of a run on the system and hands every star a view of its
+    own positions and velocities
+    '''
+    system.t, system.r, system.v = t, r, v
+    system._settings = None
+    system._buffers = None
+    
+    if isinstance(system.star_list, star_set):
+        system.star_list.r = r
+        system.star_list.v = v
+        return
+    
+    for k, star in enumerate(system.star_list):
+        star.r = r[:,k]
+        star.v = v[:,k]
+            
+
+AU = 1.496e11 # meters
+C = 3e8 # speed of light (m/s)
+
+
+def _parse_catalog(path):
+    '''
+    Reads the star table (SagittariusA_data.xlsx) and converts it to SI units.
+    This is the slow part that load_catalog() caches
+    '''
+    import pandas as pd
+    
+    df = pd.read_excel(path)
+    return {"labels": np.array(df["id1"], dtype=str),
+            "q": np.array(df["q (AU)"], dtype=float)*AU, # pericentre distance (m)
+            "dq": np.array(df["Δq"], dtype=float)*AU,
+            "v": np.array(df["v (%c)"], dtype=float)*0.01*C, # pericentre speed (m/s)
+            "dv": np.array(df["Δv"], dtype=float)*0.01*C,
+            "i": np.array(df["i (°)"], dtype=float)*np.pi/180, # inclination (radians)
+            "di": np.array(df["Δi"], dtype=float)*np.pi/180}
+
+
+def catalog_state(cat, dim=2):
+    '''
+    Initial positions and velocities of the stars of a catalog, placed at 
+    pericentre like in the notebooks: in 2d r0 = [q, 0] and v0 = [0, v], in 3d
+    the orbit is tilted by its inclination, r0 = [q cos(i), 0, q sin(i)] and 
+    v0 = [0, v, 0]
+    
+    returns:
+        
+        r0, v0 : arrays of shape (number of stars, dim)
+    '''
+    zero = np.zeros_like(cat["q"])
+    
+    if dim == 2:
+        r0 = np.stack([cat["q"], zero], axis=1)
+        v0 = np.stack([zero, cat["v"]], axis=1)
+    else:
+        r0 = np.stack([cat["q"]*np.cos(cat["i"]), zero, cat["q"]*np.sin(cat["i"])], axis=1)
+        v0 = np.stack([zero, cat["v"], zero], axis=1)
+    
+    return r0, v0
+
+
+def load_catalog(path="SagittariusA_data.xlsx", dim=2):
+    '''
+    Loads the star table in SI units. The spreadsheet is only parsed the first
+    time, after that the converted columns are read from a binary copy 
+    (path + ".cache.npz") that is remade whenever the spreadsheet changes
+    
+    arguments:
+        
+        path : str
+            location of the spreadsheet
+        
+        dim : int
+            number of spatial dimensions of the returned r0 and v0 (2 or 3)
+    
+    returns:
+        
+        dict of arrays: "labels", "q", "dq" (pericentre distance and error, m),
+        "v", "dv" (pericentre speed and error, m/s), "i", "di" (inclination and
+        error, radians), and "r0", "v0" ready to use initial conditions, see 
+        catalog_state()
+    '''
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    
+    cache = path + ".cache.npz"
+    cat = None
+    if os.path.exists(cache):
+        try:
+            with np.load(cache) as data:
+                if str(data["sha256"]) == digest:
+                    cat = {key: data[key] for key in data.files if key != "sha256"}
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            cat = None # a broken cache is read again from the spreadsheet
+    
+    if cat is None:
+        cat = _parse_catalog(path)
+        # written next to the cache first and then moved over it, so a reader 
+        # never sees half of a file (the pid keeps parallel runs apart)
+        tmp = "%s.%d.tmp" % (cache, os.getpid())
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(f, sha256=digest, **cat)
+            os.replace(tmp, cache)
+        except OSError:
+            # read only folder, just skip the cache
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    
+    cat["r0"], cat["v0"] = catalog_state(cat, dim)
+    return cat
+
+
+def catalog_stars(path="SagittariusA_data.xlsx", dim=2):
+    '''
+    List of labelled star objects for every star in the catalog, see 
+    load_catalog()
+    '''
+    cat = load_catalog(path, dim)
+    return [star(r0, v0, str(label)) for r0, v0, label in zip(cat["r0"], cat["v0"], cat["labels"])]
+
+
+def catalog_star_set(path="SagittariusA_data.xlsx", dim=2):
+    '''
+    The whole catalog as a star_set, see load_catalog()
+    '''
+    cat = load_catalog(path, dim)
+    return star_set(cat["r0"], cat["v0"], labels=[str(label) for label in cat["labels"]])
+
+
+class ensemble_result:
+    '''
+    Result of ensemble(), K perturbed copies of every catalog star integrated 
+    together, with percentile envelopes over the copies
+    
+    attributes:
+        
+        t : array
+            stored times (seconds)
+        
+        r, v : array
+            positions and velocities of every copy, shape (stored times, K, 
+            stars, dim), as memory mapped .npy files. Only kept when ensemble()
+            was given a store folder, None otherwise
+        
+        r0, v0 : array
+            initial conditions that were drawn, shape (K, stars, dim)
+        
+        labels : list
+            star labels
+        
+        q : list
+            percentiles of the envelopes
+        
+        envelopes : dict
+            percentiles over the copies, first axis matching q: "r" (shape 
+            (len(q), stored times, stars, dim)), "distance" from the black hole
+            (len(q), stored times, stars), and the orbit of each star from its 
+            initial conditions (len(q), stars): "a" semi-major axis (m), "e" 
+            eccentricity, "period" (seconds), "pericentre" and "apocentre" 
+            distances (m). Unbound copies count as NaN in "a", "period" and
+            "apocentre" and are left out of their percentiles
+        
+        bound : array
+            fraction of the copies of each star that are bound
+    '''
+    
+    def __init__(self, t, r, v, r0, v0, labels, q, envelopes, bound):
+        self.t = t
+        self.r = r
+        self.v = v
+        self.r0 = r0
+        self.v0 = v0
+        self.labels = labels
+        self.q = q
+        self.envelopes = envelopes
+        self.bound = bound
+
+
+def ensemble(M, tfinal, dt, K, path="SagittariusA_data.xlsx", dim=2, stars=None,
+             every=1, t_eval=None, q=(5, 50, 95), chunk=None, seed=None, 
+             integrator="verlet", store=None):
+    '''
+    Monte Carlo over the measurement errors of the catalog. K copies of every 
+    star are drawn with q, v and i (pericentre distance, speed and inclination)
+    spread by their errors dq, dv and di (normal distributions), and are all 
+    integrated as one batch of test particles. To keep the memory bounded the
+    run is streamed chunk stored times at a time (see verlet_chunks()), each 
+    block is reduced to its percentiles and then dropped, so only the 
+    envelopes are kept (and the raw r and v are written to store when given)
+    
+    arguments:
+        
+        M : float
+            Mass of central black hole for which all other stars orbit around
+        
+        tfinal, dt : float
+            length of the run and time step (seconds)
+        
+        K : int
+            number of copies of every star
+        
+        path : str
+            location of the spreadsheet, see load_catalog()
+        
+        dim : int
+            number of spatial dimensions (2 or 3)
+        
+        stars : array
+            indices (or a mask) of the catalog stars to use, None uses all of 
+            them
+        
+        every, t_eval : 
+            which time steps to store, see iterate()
+        
+        q : list
+            percentiles of the envelopes
+        
+        chunk : int
+            number of stored times in each block of the run, this bounds the 
+            memory used at once to about chunk*K*stars*dim values. None picks 
+            blocks of about 10^7 values
+        
+        seed : int
+            seed of the random draws, so an ensemble can be repeated
+        
+        integrator : str
+            which scheme in INTEGRATORS to use
+        
+        store : str
+            folder to write the positions and velocities of every copy into as
+            memory mapped .npy files (r.npy, v.npy), they are not kept otherwise
+    
+    returns:
+        
+        ensemble_result object
+    '''
+    G = 6.67e-11
+    cat = load_catalog(path, dim)
+    if stars is not None:
+        cat = {key: value[stars] for key, value in cat.items()}
+    n_stars = len(cat["q"])
+    
+    # draw the perturbed catalogs, shape (K, stars)
+    rng = np.random.default_rng(seed)
+    draw = {}
+    for key in ("q", "v", "i"):
+        draw[key] = cat[key] + cat["d" + key]*rng.standard_normal((K, n_stars))
+    draw["q"] = np.abs(draw["q"])
+    draw["v"] = np.abs(draw["v"])
+    
+    flat = {key: value.ravel() for key, value in draw.items()}
+    r0, v0 = catalog_state(flat, dim)
+    r0 = r0.reshape(K, n_stars, dim)
+    v0 = v0.reshape(K, n_stars, dim)
+    
+    n = int(tfinal/dt)
+    steps = output_steps(n, dt, every, t_eval, tfinal=tfinal)
+    shape = (len(steps), K, n_stars, dim)
+    r = v = None
+    if store is not None:
+        os.makedirs(store, exist_ok=True)
+        r = np.lib.format.open_memmap(os.path.join(store, "r.npy"), mode="w+", shape=shape)
+        v = np.lib.format.open_memmap(os.path.join(store, "v.npy"), mode="w+", shape=shape)
+    
+    # every copy of every star is one flat batch of test particles, streamed a
+    # block of stored times at a time and reduced to the envelopes as it goes
+    if chunk is None:
+        chunk = max(1, (10**7)//(K*n_stars*dim))
+    batch = star_set(r0.reshape(-1, dim), v0.reshape(-1, dim))
+    env_r = np.zeros((len(q), len(steps), n_stars, dim))
+    env_d = np.zeros((len(q), len(steps), n_stars))
+    b0 = 0
+    for t_b, r_b, v_b in verlet_chunks(batch, M, dt, n, chunk, dim, every, integrator, 
+                                       t_eval=steps*dt):
+        b1 = b0 + len(t_b)
+        r_b = r_b.reshape(len(t_b), K, n_stars, dim)
+        env_r[:, b0:b1] = np.percentile(r_b, q, axis=1)
+        env_d[:, b0:b1] = np.percentile(np.sqrt(np.sum(r_b*r_b, axis=-1)), q, axis=1)
+        if store is not None:
+            r[b0:b1] = r_b
+            v[b0:b1] = v_b.reshape(len(t_b), K, n_stars, dim)
+        b0 = b1
+    
+    if store is not None:
+        r.flush()
+        v.flush()
+    
+    # orbit of every copy from its initial conditions
+    E, L, A = orbital_invariants(r0, v0, M)
+    e = np.sqrt(np.sum(A*A, axis=-1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        a = np.where(E < 0, -G*M/(2*E), np.nan)
+        period = 2*np.pi*np.sqrt(a**3/(G*M))
+    L2 = np.sum(np.reshape(L*L, (K, n_stars, -1)), axis=-1)
+    pericentre = L2/(G*M*(1 + e))
+    
+    envelopes = {"r": env_r, "distance": env_d}
+    with warnings.catch_warnings():
+        # stars with no bound copies have no percentiles
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for key, value in (("a", a), ("e", e), ("period", period), 
+                           ("pericentre", pericentre), ("apocentre", a*(1 + e))):
+            envelopes[key] = np.nanpercentile(value, q, axis=0)
+    
+    return ensemble_result(steps*dt, r, v, r0, v0, [str(label) for label in cat["labels"]],
+                           list(q), envelopes, np.mean(E < 0, axis=0))
+
+
+def star_speeds(star_list):
+    '''
+    Distance from the central mass and speed of every star at its initial 
+    conditions, as two arrays
+    '''
+    if isinstance(star_list, star_set):
+        r0, v0 = star_list.r0, star_list.v0
+    else:
+        r0 = np.array([np.asarray(star.r0, dtype=float) for star in star_list])
+        v0 = np.array([np.asarray(star.v0, dtype=float) for star in star_list])
+    return np.sqrt(np.sum(r0*r0, axis=1)), np.sqrt(np.sum(v0*v0, axis=1))
+
+
+def escape_velocity(M, r):
+    '''
+    Escape velocity sqrt(2GM/r) from the central mass. M and r broadcast 
+    against each other, so a grid of masses and distances can be done at once
+    '''
+    G = 6.67e-11
+    return np.sqrt(2*G*np.asarray(M)/np.asarray(r))
+
+
+@functools.lru_cache(maxsize=128)
+def escape_velocity_curve(M, disi, disf, num=1000):
+    '''
+    Escape velocity at num distances between disi and disf, as used for the 
+    escape velocity plots. Cached on (M, disi, disf, num), so drawing the same
+    curve again is free. The arrays are read only since they are shared
+    
+    returns:
+        
+        dis, EV : distances (m) and escape velocities (m/s)
+    '''
+    dis = np.linspace(disi, disf, num)
+    EV = escape_velocity(M, dis)
+    dis.flags.writeable = False
+    EV.flags.writeable = False
+    return dis, EV
+
+
+def residuals(M, star_list):
+    '''
+    Difference between the initial speed of every star and the escape velocity
+    at its initial distance, for every mass in M at once. Positive values mean
+    the star is not bound to that mass
+    
+    arguments:
+        
+        M : float or array
+            central mass(es) to try (kg)
+        
+        star_list : star
+            list of star objects
+    
+    returns:
+        
+        array of shape (number of masses, number of stars)
+    '''
+    rads, vels = star_speeds(star_list)
+    M = np.atleast_1d(np.asarray(M, dtype=float))
+    return vels[None,:] - escape_velocity(M[:,None], rads[None,:])
+
+
+def bound_table(M, star_list):
+    '''
+    True where a star is bound to the central mass, shape (number of masses, 
+    number of stars), see residuals()
+    '''
+    return residuals(M, star_list) < 0
+
+
+
+class system2d:
+    '''
+    2d simulation of astronomical bodies orbiting around a large central mass 
+    
+    attributes:
+        
+        star_list : star
+            list of star objects (or a star_set) that will be orbiting around 
+            the central mass
+        
+        M : float
+            Mass of central black hole for which all other stars orbit around
+        
+        t : array
+            times (seconds) of the stored time steps, defined in the iterate() method
+        
+        r, v : array
+            positions and velocities of every star, shape (stored steps, stars, 2)
+            defined in the iterate() method
+    
+    methods:
+        
+        iterate : 
+            Uses a method known as the Velocity - Verlet method to propagate 
+            the motion of the stars as they orbit around the central mass
+        
+        extend : 
+            Carries on the last run for longer without starting again
+        
+        iter_chunks : 
+            Same integration as iterate, but yields the result in blocks instead
+            of storing it all
+        
+        propagate : 
+            Exact positions and velocities at any times from the analytic Kepler
+            orbit, no iteration needed
+        
+        position_at, velocity_at : 
+            Positions and velocities at any times inside of the stored run,
+            interpolated between the stored steps
+        
+        animate : 
+            Makes a matplotlib animation of the stored run
+        
+        render : 
+            Writes the stored run to a video or gif from a batch job
+        
+        plot : 
+            Plots an animation of the star's motion based on the values within
+            the star objects
+    
+    '''
+    
+    def __init__(self, star_list, M):  
+        self.star_list = star_list
+        self.M = M
+    
+    def iterate(self,tfinal,dt,every=1,t_eval=None,final_only=False,store=None,
+                backend="numpy",adaptive=False,tol=1e-2,integrator="verlet",
+                self_gravity=None,theta=0.5,checkpoint=None,checkpoint_every=1000,
+                profile=None,diagnostics=None,events=None,eps=0):
+        '''
+        Uses the the Velocity - Verlet method to propagate the motion of the stars 
+        as they orbit around the central mass.
+        Stores position and velocity values inside of the star objects
+        
+        arguments:
+            
+            tfinal : float
+                length of time at which we want to iterate over (seconds)
+            
+            dt : float
+                amount of time between each iteration. Smaller values will result
+                in a more accurate measurement, but it will also make the simulation
+                take longer to run
+            
+            every : int
+                only store every k-th time step, the run itself still uses dt
+            
+            t_eval : array
+                store only these times (seconds). Each one is rounded to the 
+                nearest time step, so it can be up to dt/2 away, and the steps 
+                are stored in time order whatever the order of t_eval. self.t 
+                holds the times that were actually stored, position_at() gives
+                the exact times. tfinal can be asked for, it gives the last step
+            
+            final_only : bool
+                only store the positions and velocities at the end of the run
+            
+            store : str
+                folder to write the run into as memory mapped .npy files instead
+                of keeping it in memory, reopen it later with load_store()
+            
+            backend : str
+                "numpy" (default) or "numba" to run the integration as a compiled
+                loop, which is much faster for long runs with few stars
+            
+            adaptive : bool
+                let every star pick its own step size instead of using dt, see
+                adaptive_verlet(). dt is then only the spacing of the stored steps
+                (numpy backend only)
+            
+            tol : float
+                step size of the adaptive mode as a fraction of each star's local
+                dynamical time
+            
+            integrator : str
+                "verlet" (2nd order, default), "yoshida4" or "yoshida6". The 
+                higher order schemes cost 3 and 9 force evaluations per step but 
+                allow a much larger dt for the same accuracy. "kepler" skips the 
+                time stepping and uses the exact solution, see kepler_propagate()
+            
+            self_gravity : str
+                None (default) only includes the central mass. "direct" also adds
+                the pull of every star on every other star (star.m), "tree" does 
+                the same with the faster Barnes - Hut approximation
+            
+            theta : float
+                opening angle of the "tree" self gravity, see tree_acceleration()
+            
+            eps : float
+                softening length (m) of the self gravity, see direct_acceleration()
+            
+            checkpoint : str
+                file to save the state of the run to every checkpoint_every steps.
+                If the run dies, resume(checkpoint) carries on from the last save.
+                Without a store the stored steps are written as they go to 
+                checkpoint + ".r.npy" and ".v.npy" next to it, so a checkpoint 
+                never has to write them again
+            
+            checkpoint_every : int
+                number of time steps between checkpoints
+            
+            profile : profiler
+                times the phases of the run and reports progress, see profiler.
+                True uses a profiler with the default settings. Without a 
+                profiler "Data Instantiation Finished" is printed at the end, 
+                with one the end of the run goes to its progress callback
+                (print_progress prints it, no callback keeps the run quiet). 
+                The profiler is kept as self.profile, print(self.profile.report())
+                shows where the time went
+            
+            diagnostics : diagnostics
+                checks energy, angular momentum and the Laplace - Runge - Lenz 
+                vector of every star during the run, and stops it early when 
+                they drift too far (see diagnostics). Kept as self.diagnostics
+            
+            events : orbit_events
+                records the pericentre and apocentre passages of every star 
+                during the run, see orbit_events. True makes a new one. Kept as
+                self.events, e.g. self.events.orbit(0)["period"]. Use together 
+                with final_only=True when only the events are needed
+        '''
+        
+        _run(self, tfinal, dt, 2, every, t_eval, final_only, store, backend,
+             adaptive, tol, integrator, self_gravity, theta, checkpoint, 
+             checkpoint_every, profile, diagnostics, events, eps)
+        
+        # with a profiler the end of the run is reported by its progress callback
+        if profile is None:
+            print("Data Instantiation Finished")
+    
+    def propagate(self,t):
+        '''
+        Stores the exact positions and velocities of the stars at the times t
+        inside of the star objects, using the analytic solution of the orbit 
+        around the central mass (see kepler_propagate()) instead of iterating
+        
+        arguments:
+            
+            t : array
+                times (seconds) to find the positions and velocities at, as far 
+                in the future as needed. They can be given in any order, but are
+                stored in time order (self.t) like the steps of iterate()
+        '''
+        t = np.sort(np.atleast_1d(np.asarray(t, dtype=float)))
+        r0, v0 = initial_state(self.star_list, 2)
+        r, v = kepler_propagate(r0, v0, self.M, t)
+        _store(self, t, r, v)
+    
+    def position_at(self,times):
+        '''
+        Positions of every star at any times inside of the stored run, 
+        interpolated from the stored steps (see dense_output()), so observation
+        epochs can be matched without iterating at a tiny dt
+        
+        arguments:
+            
+            times : array
+                times (seconds) between the first and last stored step
+        
+        returns:
+            
+            array of shape (len(times), number of stars, dim)
+        '''
+        return dense_output(self.t, self.r, self.v, np.atleast_1d(times), self.M)
+    
+    def velocity_at(self,times):
+        '''
+        Velocities of every star at any times inside of the stored run, see 
+        position_at()
+        '''
+        settings = getattr(self, "_settings", None) or {}
+        nbody = _nbody(self.star_list, settings.get("self_gravity"), settings.get("theta", 0.5),
+                       settings.get("eps", 0))
+        return dense_output(self.t, self.r, self.v, np.atleast_1d(times), self.M, nbody, 1)
+    
+    def extend(self,extra_time,every=None):
+        '''
+        Carries on the last run of iterate() for extra_time more seconds, with
+        the same settings, and adds the new steps on to the end of the stored 
+        positions and velocities instead of starting again from t = 0
+        
+        arguments:
+            
+            extra_time : float
+                length of time to add to the run (seconds), rounded down to a 
+                whole number of stored steps
+            
+            every : int
+                only store every k-th time step of the new part (defaults to the
+                every of the original run)
+        '''
+        _extend(self, extra_time, 2, every)
+    
+    def iter_chunks(self,tfinal,dt,chunk_steps,every=1,integrator="verlet",
+                    self_gravity=None,theta=0.5,eps=0):
+        '''
+        Streaming version of iterate(). Instead of filling up the star objects it
+        yields the run in blocks, so long runs can be written to disk or plotted 
+        as they go without ever holding the whole trajectory
+        
+        arguments:
+            
+            tfinal : float
+                length of time at which we want to iterate over (seconds)
+            
+            dt : float
+                amount of time between each iteration
+            
+            chunk_steps : int
+                number of stored time steps in each block
+            
+            every : int
+                only store every k-th time step, the run itself still uses dt
+            
+            integrator : str
+                "verlet", "yoshida4" or "yoshida6"
+            
+            self_gravity, theta, eps : 
+                include the pull of the stars on each other, see iterate()
+        
+        yields:
+            
+            t, r, v : times of the block (seconds) and the positions and velocities
+                of every star, shape (block length, stars, 2)
+        '''
+        n = int(tfinal/dt)
+        
+        nbody = _nbody(self.star_list, self_gravity, theta, eps)
+        
+        yield from verlet_chunks(self.star_list, self.M, dt, n, chunk_steps, 2, every,
+                                 integrator, nbody)
+            
+    def animate(self, xlim, ylim, fps=30, seconds=10, trail=0):
+        '''
+        Makes an animation of the stored run, see animate_run(). Use it as 
+        anim.save(...) or HTML(anim.to_jshtml()), or show it live with an 
+        interactive matplotlib backend
+        
+        arguments:
+            
+            xlim: list
+                the x bounds of the plot 
+            
+            ylim: list
+                the y bounds of the plot
+            
+            fps : float
+                frames per second of the animation
+            
+            seconds : float
+                length of the animation, stored steps are skipped to fit
+            
+            trail : int
+                number of earlier frames drawn as a fading tail behind each star
+        
+        returns:
+            
+            matplotlib.animation.FuncAnimation
+        '''
+        from orbit_plots import _pyplot, animate_run
+        
+        plt = _pyplot()
+        fig = plt.figure()
+        ax = plt.axes()
+        ax.set_xlim(xlim)
+        ax.set_ylim(ylim)
+        
+        return animate_run(self, ax, fps, seconds, trail)
+    
+    def render(self, path, xlim, ylim, fps=30, stride=1, trail=0, size=(6,6), dpi=100,
+               workers=None):
+        '''
+        Renders the stored run to an .mp4, .gif or folder of png frames without
+        needing a display, see render()
+        
+        arguments:
+            
+            path : str
+                file (.mp4 or .gif) or folder to write
+            
+            xlim, ylim: list
+                bounds of the plot
+            
+            fps, stride, trail : 
+                frames per second, only draw every stride-th stored step, and
+                length of the fading tails
+            
+            size, dpi : 
+                figure size (inches) and resolution
+            
+            workers : int
+                number of worker processes drawing frames
+        '''
+        from orbit_plots import render
+        render(self, path, [xlim, ylim], fps, stride, trail, size, dpi, workers)
+    
+    def plot(self, xlim, ylim, tf, dt=None, fps=30, seconds=10, trail=0):
+        '''
+        Plots out the paths of each star oject as a 2d animation inside of a 
+        notebook, as a video when ffmpeg is installed and otherwise as a 
+        javascript player holding every frame
+        
+        arguments:
+            
+            xlim: list
+                the x bounds of the plot 
+            
+            ylim: list
+                the y bounds of the plot
+            
+            tf : float
+                only the run up to this time is animated (in seconds)
+            
+            dt : float
+                deprecated and ignored, the frames come from the stored steps. 
+                Use fps and seconds to set the spacing of the frames instead
+            
+            fps : float
+                frames per second of the animation
+            
+            seconds : float
+                length of the animation, stored steps are skipped to fit
+            
+            trail : int
+                number of earlier frames drawn as a fading tail behind each star
+        '''
+        if dt is not None:
+            warnings.warn("plot() no longer uses dt, the frames are the stored steps "
+                          "spread over seconds at fps", DeprecationWarning, stacklevel=2)
+        from orbit_plots import _pyplot, animate_run, _notebook_html
+        from IPython.display import display, HTML
+        
+        plt = _pyplot()
+        fig = plt.figure()
+        ax = plt.axes()
+        ax.set_xlim(xlim)
+        ax.set_ylim(ylim)
+        
+        anim = animate_run(self, ax, fps, seconds, trail, tf)
+        display(HTML(_notebook_html(anim)))
+        plt.close(fig)
+
+    def Escape_velocity(self,starlist):
+        """Find the escape velocity of star and plot it as a function of distance
+        **We will assume the radius of the star is a point**
+        starlist: list of star objects to find array of distance to find
+        returns the distances and escape velocities that were plotted
+        """
+        rads, vels = star_speeds(starlist)
+        
+        self.dis, self.EV = escape_velocity_curve(self.M, 0.2*rads.min(), 1.1*rads.max())
+        from orbit_plots import _pyplot
+        plt = _pyplot()
+        plt.plot(self.dis,self.EV)
+        plt.title("Escape velocity as a function of distance| Mass= "+str(self.M),y=1.05)
+        plt.ylabel("Escape Velocity (m/s)")
+        plt.xlabel("distance to black hole (m)")
+        
+        return self.dis, self.EV
+      
+        
+    def ScatterStars(self,star_list,label):
+        """Plots the Stars of our choice on a plot.
+        star_list= list of star objets
+        """
+        rads, vels = star_speeds(star_list)
+        from orbit_plots import _pyplot
+        plt = _pyplot()
+        for i in range(len(star_list)):
+            plt.scatter(rads[i],vels[i],label=str(label[i]))
+        plt.title("Escape velocity as a function of distance| Mass= "+str(self.M))
+        plt.ylabel("Escape Velocity (m/s)")
+        plt.xlabel("distance to black hole (m)")
+        plt.legend()
+            
+        
+    def Residuals(self,star_list,label=None,M=None):
+        """Finds the diffrence between the initial velocity of each star and the escape
+        velocity from the black hole (positive means the star is not bound)
+        label: optional names of the stars, when given each residual is printed
+        M: optional list of masses to try instead of self.M
+        returns an array of shape (stars) or (masses, stars) when M is given
+        """
+        res = residuals(self.M if M is None else M, star_list)
+        if label is not None:
+            for i in range(len(res)):
+                for j in range(len(star_list)):
+                    if M is None:
+                        print("The residual for",label[j],"is",res[i,j])
+                    else:
+                        print("The residual for",label[j],"with M =",np.atleast_1d(M)[i],"is",res[i,j])
+        if M is None:
+            return res[0]
+        return res
+
+            
+class system3d:
+    '''
+    3d simulation of astronomical bodies orbiting around a large central mass 
+    
+    attributes:
+        
+        star_list : star
+            list of star objects (or a star_set) that will be orbiting around 
+            the central mass
+
+        M : float
+            Mass of central black hole for which all other stars orbit around
+
+        t : array
+            times (seconds) of the stored time steps, defined in the iterate() method
+        
+        r, v : array
+            positions and velocities of every star, shape (stored steps, stars, 3)
+            defined in the iterate() method
+
+    methods:
+        
+        iterate : 
+            Uses a method known as the Velocity - Verlet method to propagate 
+            the motion of the stars as they orbit around the central mass
+        
+        extend : 
+            Carries on the last run for longer without starting again
+        
+        iter_chunks : 
+            Same integration as iterate, but yields the result in blocks instead
+            of storing it all
+        
+        propagate : 
+            Exact positions and velocities at any times from the analytic Kepler
+            orbit, no iteration needed
+        
+        position_at, velocity_at : 
+            Positions and velocities at any times inside of the stored run,
+            interpolated between the stored steps
+        
+        animate : 
+            Makes a matplotlib animation of the stored run
+        
+        render : 
+            Writes the stored run to a video or gif from a batch job
+        
+        plot : 
+            Plots an animation of the star's motion based on the values within
+            the star objects
+        
+    ''' 
+    def __init__(self, star_list, M):
+        self.star_list = star_list
+        self.M = M
+        
+    def iterate(self,tfinal,dt,every=1,t_eval=None,final_only=False,store=None,
+                backend="numpy",adaptive=False,tol=1e-2,integrator="verlet",
+                self_gravity=None,theta=0.5,checkpoint=None,checkpoint_every=1000,
+                profile=None,diagnostics=None,events=None,eps=0):
+        '''
+        Uses the Velocity - Verlet iterative method to propagate the motion of the 
+        stars as they orbit around the central mass. Stores position and velocity 
+        values inside of the star objects
+        
+        arguments:
+            
+            tfinal : float
+                length of time at which we want to iterate over (in years)
+            
+            dt : float
+                amount of time between each iteration. Smaller values will result
+                in a more accurate measurement, but it will also make the simulation
+                take longer to run
+            
+            every : int
+                only store every k-th time step, the run itself still uses dt
+            
+            t_eval : array
+                store only these times (seconds). Each one is rounded to the 
+                nearest time step, so it can be up to dt/2 away, and the steps 
+                are stored in time order whatever the order of t_eval. self.t 
+                holds the times that were actually stored, position_at() gives
+                the exact times. tfinal can be asked for, it gives the last step
+            
+            final_only : bool
+                only store the positions and velocities at the end of the run
+            
+            store : str
+                folder to write the run into as memory mapped .npy files instead
+                of keeping it in memory, reopen it later with load_store()
+            
+            backend : str
+                "numpy" (default) or "numba" to run the integration as a compiled
+                loop, which is much faster for long runs with few stars
+            
+            adaptive : bool
+                let every star pick its own step size instead of using dt, see
+                adaptive_verlet(). dt is then only the spacing of the stored steps
+                (numpy backend only)
+            
+            tol : float
+                step size of the adaptive mode as a fraction of each star's local
+                dynamical time
+            
+            integrator : str
+                "verlet" (2nd order, default), "yoshida4" or "yoshida6". The 
+                higher order schemes cost 3 and 9 force evaluations per step but 
+                allow a much larger dt for the same accuracy. "kepler" skips the 
+                time stepping and uses the exact solution, see kepler_propagate()
+            
+            self_gravity : str
+                None (default) only includes the central mass. "direct" also adds
+                the pull of every star on every other star (star.m), "tree" does 
+                the same with the faster Barnes - Hut approximation
+            
+            theta : float
+                opening angle of the "tree" self gravity, see tree_acceleration()
+            
+            eps : float
+                softening length (m) of the self gravity, see direct_acceleration()
+            
+            checkpoint : str
+                file to save the state of the run to every checkpoint_every steps.
+                If the run dies, resume(checkpoint) carries on from the last save.
+                Without a store the stored steps are written as they go to 
+                checkpoint + ".r.npy" and ".v.npy" next to it, so a checkpoint 
+                never has to write them again
+            
+            checkpoint_every : int
+                number of time steps between checkpoints
+            
+            profile : profiler
+                times the phases of the run and reports progress, see profiler.
+                True uses a profiler with the default settings. Without a 
+                profiler "Data Instantiation Finished" is printed at the end, 
+                with one the end of the run goes to its progress callback
+                (print_progress prints it, no callback keeps the run quiet). 
+                The profiler is kept as self.profile, print(self.profile.report())
+                shows where the time went
+            
+            diagnostics : diagnostics
+                checks energy, angular momentum and the Laplace - Runge - Lenz 
+                vector of every star during the run, and stops it early when 
+                they drift too far (see diagnostics). Kept as self.diagnostics
+            
+            events : orbit_events
+                records the pericentre and apocentre passages of every star 
+                during the run, see orbit_events. True makes a new one. Kept as
+                self.events, e.g. self.events.orbit(0)["period"]. Use together 
+                with final_only=True when only the events are needed
+        '''
+        
+        _run(self, tfinal, dt, 3, every, t_eval, final_only, store, backend,
+             adaptive, tol, integrator, self_gravity, theta, checkpoint, 
+             checkpoint_every, profile, diagnostics, events, eps)
+        
+        # with a profiler the end of the run is reported by its progress callback
+        if profile is None:
+            print("Data Instantiation Finished")
+    
+    def propagate(self,t):
+        '''
+        Stores the exact positions and velocities of the stars at the times t
+        inside of the star objects, using the analytic solution of the orbit 
+        around the central mass (see kepler_propagate()) instead of iterating
+        
+        arguments:
+            
+            t : array
+                times (seconds) to find the positions and velocities at, as far 
+                in the future as needed. They can be given in any order, but are
+                stored in time order (self.t) like the steps of iterate()
+        '''
+        t = np.sort(np.atleast_1d(np.asarray(t, dtype=float)))
+        r0, v0 = initial_state(self.star_list, 3)
+        r, v = kepler_propagate(r0, v0, self.M, t)
+        _store(self, t, r, v)
+    
+    def position_at(self,times):
+        '''
+        Positions of every star at any times inside of the stored run, 
+        interpolated from the stored steps (see dense_output()), so observation
+        epochs can be matched without iterating at a tiny dt
+        
+        arguments:
+            
+            times : array
+                times (seconds) between the first and last stored step
+        
+        returns:
+            
+            array of shape (len(times), number of stars, dim)
+        '''
+        return dense_output(self.t, self.r, self.v, np.atleast_1d(times), self.M)
+    
+    def velocity_at(self,times):
+        '''
+        Velocities of every star at any times inside of the stored run, see 
+        position_at()
+        '''
+        settings = getattr(self, "_settings", None) or {}
+        nbody = _nbody(self.star_list, settings.get("self_gravity"), settings.get("theta", 0.5),
+                       settings.get("eps", 0))
+        return dense_output(self.t, self.r, self.v, np.atleast_1d(times), self.M, nbody, 1)
+    
+    def extend(self,extra_time,every=None):
+        '''
+        Carries on the last run of iterate() for extra_time more seconds, with
+        the same settings, and adds the new steps on to the end of the stored 
+        positions and velocities instead of starting again from t = 0
+        
+        arguments:
+            
+            extra_time : float
+                length of time to add to the run (seconds), rounded down to a 
+                whole number of stored steps
+            
+            every : int
+                only store every k-th time step of the new part (defaults to the
+                every of the original run)
+        '''
+        _extend(self, extra_time, 3, every)
+    
+    def iter_chunks(self,tfinal,dt,chunk_steps,every=1,integrator="verlet",
+                    self_gravity=None,theta=0.5,eps=0):
+        '''
+        Streaming version of iterate(). Instead of filling up the star objects it
+        yields the run in blocks, so long runs can be written to disk or plotted 
+        as they go without ever holding the whole trajectory
+        
+        arguments:
+            
+            tfinal : float
+                length of time at which we want to iterate over (seconds)
+            
+            dt : float
+                amount of time between each iteration
+            
+            chunk_steps : int
+                number of stored time steps in each block
+            
+            every : int
+                only store every k-th time step, the run itself still uses dt
+            
+            integrator : str
+                "verlet", "yoshida4" or "yoshida6"
+            
+            self_gravity, theta, eps : 
+                include the pull of the stars on each other, see iterate()
+        
+        yields:
+            
+            t, r, v : times of the block (seconds) and the positions and velocities
+                of every star, shape (block length, stars, 3)
+        '''
+        n = int(tfinal/dt)
+        
+        nbody = _nbody(self.star_list, self_gravity, theta, eps)
+        
+        yield from verlet_chunks(self.star_list, self.M, dt, n, chunk_steps, 3, every,
+                                 integrator, nbody)
+            
+    def animate(self, xlim, ylim, zlim, fps=30, seconds=10, trail=0):
+        '''
+        Makes a 3d animation of the stored run, see animate_run() and 
+        system2d.animate()
+        
+        arguments:
+            
+            xlim, ylim, zlim: list
+                the x, y and z bounds of the plot 
+            
+            fps, seconds, trail : 
+                frames per second, length (seconds) and tail length of the 
+                animation
+        
+        returns:
+            
+            matplotlib.animation.FuncAnimation
+        '''
+        from orbit_plots import _pyplot, animate_run
+        
+        plt = _pyplot()
+        fig = plt.figure()
+        ax = plt.axes(projection='3d')
+        ax.set_xlim(xlim)
+        ax.set_ylim(ylim)
+        ax.set_zlim(zlim)
+        
+        return animate_run(self, ax, fps, seconds, trail)
+    
+    def render(self, path, xlim, ylim, zlim, fps=30, stride=1, trail=0, size=(6,6), dpi=100,
+               workers=None):
+        '''
+        Renders the stored run to an .mp4, .gif or folder of png frames without
+        needing a display, see render()
+        
+        arguments:
+            
+            path : str
+                file (.mp4 or .gif) or folder to write
+            
+            xlim, ylim, zlim: list
+                bounds of the plot
+            
+            fps, stride, trail : 
+                frames per second, only draw every stride-th stored step, and
+                length of the fading tails
+            
+            size, dpi : 
+                figure size (inches) and resolution
+            
+            workers : int
+                number of worker processes drawing frames
+        '''
+        from orbit_plots import render
+        render(self, path, [xlim, ylim, zlim], fps, stride, trail, size, dpi, workers)
+    
+    def plot(self, xlim, ylim, zlim, tf, dt=None, fps=30, seconds=10, trail=0):
+        '''
+        Plots out the paths of each star oject as a 3d animation inside of a 
+        notebook, as a video when ffmpeg is installed and otherwise as a 
+        javascript player holding every frame
+        
+        arguments:
+        
+            xlim: list
+                the x bounds of the plot 
+            
+            ylim: list
+                the y bounds of the plot
+
+            zlim: list
+                the z bounds of the plot
+
+            tf : float
+                only the run up to this time is animated (in seconds)
+            
+            dt : float
+                deprecated and ignored, the frames come from the stored steps. 
+                Use fps and seconds to set the spacing of the frames instead
+            
+            fps : float
+                frames per second of the animation
+            
+            seconds : float
+                length of the animation, stored steps are skipped to fit
+            
+            trail : int
+                number of earlier frames drawn as a fading tail behind each star
+        '''
+        if dt is not None:
+            warnings.warn("plot() no longer uses dt, the frames are the stored steps "
+                          "spread over seconds at fps", DeprecationWarning, stacklevel=2)
+        from orbit_plots import _pyplot, animate_run, _notebook_html
+        from IPython.display import display, HTML
+        
+        plt = _pyplot()
+        fig = plt.figure()
+        ax = plt.axes(projection='3d')
+        ax.set_xlim(xlim)
+        ax.set_ylim(ylim)
+        ax.set_zlim(zlim)
+        
+        anim = animate_run(self, ax, fps, seconds, trail, tf)
+        display(HTML(_notebook_html(anim)))
+        plt.close(fig)
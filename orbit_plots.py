@@ -0,0 +1,256 @@
+'''
+Plotting of the runs made with orbit_core.py: matplotlib animations of a stored
+run and offline rendering to video. Kept apart from the simulation so that
+importing orbit_core does not load matplotlib
+'''
+
+import numpy as np
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+from matplotlib import animation
+from matplotlib.collections import LineCollection
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+
+def _pyplot():
+    '''
+    Imports pyplot (and the 3d projection) the first time something is shown. 
+    The offline rendering never needs it, so render workers do not pick a 
+    display backend
+    '''
+    import matplotlib.pyplot as plt
+    from mpl_toolkits import mplot3d
+    return plt
+
+
+def _orbit_artists(ax, r, frames, trail):
+    '''
+    Draws the black hole and one frame of the stars on ax, and returns a 
+    function update(f) that moves the same artists to frame f (the stored step
+    frames[f] of r) and returns them
+    '''
+    dim = r.shape[2]
+    
+    colors = matplotlib.rcParams["axes.prop_cycle"].by_key()["color"]
+    colors = [colors[k % len(colors)] for k in range(r.shape[1])]
+    
+    # black hole in the middle, it never moves
+    if dim == 2:
+        ax.scatter(0, 0, color = "black", marker = "o")
+        stars = ax.scatter(r[0,:,0], r[0,:,1], c=colors)
+        tails = LineCollection([], linewidths=1)
+    else:
+        ax.scatter(0, 0, 0, color = "black", marker = "o")
+        stars = ax.scatter(r[0,:,0], r[0,:,1], r[0,:,2], c=colors)
+        tails = Line3DCollection([], linewidths=1)
+    ax.add_collection(tails)
+    
+    # each tail segment fades out the further back in time it is
+    fade = np.linspace(0, 1, trail+1)[1:]
+    rgba = matplotlib.colors.to_rgba_array(colors)
+    
+    def update(f):
+        i = frames[f]
+        if dim == 2:
+            stars.set_offsets(r[i,:,:2])
+        else:
+            stars._offsets3d = (r[i,:,0], r[i,:,1], r[i,:,2])
+        
+        if trail > 0:
+            past = r[frames[max(0, f-trail):f+1]]
+            segments = np.stack([past[:-1], past[1:]], axis=2) # (segment, star, 2, dim)
+            tails.set_segments(segments.transpose(1,0,2,3).reshape(-1, 2, dim))
+            alpha = np.repeat(fade[trail-len(segments):][None,:], r.shape[1], axis=0)
+            color = np.repeat(rgba, len(segments), axis=0)
+            color[:,3] = alpha.ravel()
+            tails.set_color(color)
+        
+        return stars, tails
+    
+    return update
+
+
+def _frames(system, fps, seconds, tmax=None):
+    '''
+    Stored steps to draw so the animation lasts seconds at fps frames per 
+    second (every stored step up to tmax when seconds is None)
+    '''
+    n = len(system.r) if tmax is None else int(np.searchsorted(system.t, tmax, side="right"))
+    n_frames = n if seconds is None else max(1, min(n, int(fps*seconds)))
+    return np.linspace(0, n-1, n_frames).astype(int)
+
+
+def animate_run(system, ax, fps=30, seconds=10, trail=0, tmax=None):
+    '''
+    Builds a matplotlib FuncAnimation of the stored run of a system. The 
+    artists are made once and only their data changes from frame to frame, and
+    only enough stored steps are drawn to fill seconds of animation at fps
+    frames per second
+    
+    arguments:
+        
+        system : system2d or system3d
+            system that has already been run with iterate()
+        
+        ax : matplotlib axes
+            axes to draw on (a 3d axes for 3d systems)
+        
+        fps : float
+            frames per second of the animation
+        
+        seconds : float
+            length of the animation, the stored steps are thinned out to fit. 
+            None draws every stored step
+        
+        trail : int
+            number of earlier frames to draw as a fading tail behind each star
+        
+        tmax : float
+            only animate the run up to this time (seconds)
+    
+    returns:
+        
+        matplotlib.animation.FuncAnimation
+    '''
+    frames = _frames(system, fps, seconds, tmax)
+    update = _orbit_artists(ax, system.r, frames, trail)
+    
+    return animation.FuncAnimation(ax.figure, update, frames=len(frames), 
+                                   interval=1000/fps, blit=(system.r.shape[2] == 2))
+
+
+def _notebook_html(anim):
+    '''
+    HTML that shows an animation inside of a notebook. An h264 video when 
+    ffmpeg is installed (small, whatever the figure), otherwise the javascript
+    player, which embeds every frame as a png. A 3d run at the default 300 
+    frames goes over matplotlib's 20 MB animation.embed_limit, which would 
+    silently drop the frames past it, so the limit is raised for this call
+    '''
+    if animation.writers.is_available("ffmpeg"):
+        return anim.to_html5_video()
+    with matplotlib.rc_context({"animation.embed_limit": 1000}):
+        return anim.to_jshtml()
+
+
+def _render_frames(task):
+    '''
+    Draws a range of frames to png files inside of a worker process. Uses its 
+    own Agg figure, so it never needs a display or pyplot
+    '''
+    folder, first, r, frames, lims, trail, size, dpi = task
+    
+    fig = Figure(figsize=size, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(projection="3d" if len(lims) == 3 else None)
+    ax.set_xlim(lims[0])
+    ax.set_ylim(lims[1])
+    if len(lims) == 3:
+        ax.set_zlim(lims[2])
+    
+    update = _orbit_artists(ax, r, frames, trail)
+    
+    # the first few frames are only there to give the tails some history
+    start = min(trail, first)
+    for f in range(start, len(frames)):
+        update(f)
+        fig.savefig(os.path.join(folder, "frame_%06d.png" % (first + f - start)))
+    
+    return len(frames) - start
+
+
+def render(system, path, lims, fps=30, stride=1, trail=0, size=(6,6), dpi=100,
+           workers=None):
+    '''
+    Renders the stored run of a system to a video, gif or folder of png frames
+    without a display, so it can be used from batch jobs. The frames are split
+    into blocks that are drawn in parallel by a pool of worker processes
+    
+    arguments:
+        
+        system : system2d or system3d
+            system that has already been run with iterate()
+        
+        path : str
+            file to write. ".mp4" (needs ffmpeg on the PATH) and ".gif" are 
+            stitched together from the frames, anything else is used as a folder
+            to put the png frames into
+        
+        lims : list
+            [xlim, ylim] (or [xlim, ylim, zlim] in 3d) bounds of the plot
+        
+        fps : float
+            frames per second of the video
+        
+        stride : int
+            only draw every stride-th stored step
+        
+        trail : int
+            number of earlier frames drawn as a fading tail behind each star
+        
+        size, dpi : 
+            figure size (inches) and resolution of the frames
+        
+        workers : int
+            number of worker processes (None uses every CPU)
+    '''
+    frames = np.arange(0, len(system.r), stride)
+    
+    if path.endswith(".mp4") or path.endswith(".gif"):
+        folder = tempfile.mkdtemp()
+    else:
+        folder = path
+        os.makedirs(folder, exist_ok=True)
+    
+    try:
+        # one block per worker, plus the frames before it that its tails need.
+        # Only the strided steps a block draws are sent to its worker
+        n_blocks = min(len(frames), workers or os.cpu_count() or 1)
+        tasks = []
+        for block in np.array_split(np.arange(len(frames)), n_blocks):
+            lo = max(0, block[0] - trail)
+            sub = frames[lo:block[-1]+1]
+            tasks.append((folder, block[0], system.r[sub], np.arange(len(sub)), 
+                          lims, trail, size, dpi))
+        
+        with ProcessPoolExecutor(workers) as pool:
+            list(pool.map(_render_frames, tasks))
+        
+        if path.endswith(".mp4"):
+            subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-framerate", str(fps), 
+                            "-i", os.path.join(folder, "frame_%06d.png"), 
+                            "-pix_fmt", "yuv420p", path], check=True)
+        elif path.endswith(".gif"):
+            names = sorted(os.listdir(folder))
+            _write_gif(path, [os.path.join(folder, name) for name in names], fps)
+    finally:
+        if folder != path:
+            shutil.rmtree(folder, ignore_errors=True)
+
+
+def _write_gif(path, files, fps):
+    '''
+    Writes png frames to a looping gif one frame at a time, so only a single
+    frame is ever open or in memory however long the run is. Every frame keeps
+    its own colour table
+    '''
+    from PIL import Image, GifImagePlugin
+    
+    with open(path, "wb") as fp:
+        for k, name in enumerate(files):
+            with Image.open(name) as im:
+                frame = im.convert("RGB").convert("P", palette=Image.Palette.ADAPTIVE)
+            if k == 0:
+                header, _ = GifImagePlugin.getheader(frame, info={"loop": 0})
+                for chunk in header:
+                    fp.write(chunk)
+            for chunk in GifImagePlugin.getdata(frame, duration=1000/fps, 
+                                                include_color_table=True):
+                fp.write(chunk)
+        fp.write(b";")